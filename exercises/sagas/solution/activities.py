@@ -1,22 +1,74 @@
 import asyncio
+import concurrent.futures
 import random
+from dataclasses import replace
 from time import time
+from typing import List, Optional
 
+from batching import MicroBatcher
+from billing import BillRejection
+from cache import cached_activity, normalize_address
+from corpus import open_corpus, order_from_json
+from dispatch import DispatchEngine
+from driver_service import DriverService
+from fraud import SUSPICIOUS_SCORE, score
+from gateway import PaymentDeclinedError, PaymentGatewayClient, PaymentGatewayError
+from geo import DistanceEngine, approximate_location
+from heartbeat import HeartbeatThrottle, last_checkpoint
+from idempotency import IdempotencyStore, idempotency_key, idempotent
+from inventory import InventoryShortage, InventoryStore, deduction_key
 from shared import (
     Address,
     Bill,
     CreditCardCharge,
     CreditCardConfirmation,
+    DeliveryCheckpoint,
+    DispatchRequest,
     Distance,
+    DriverAssignment,
+    FraudCheck,
+    FraudScore,
     OrderConfirmation,
+    OrderPage,
+    OrderPageResult,
     PizzaOrder,
 )
 from temporalio import activity
 from temporalio.exceptions import ApplicationError
 
 
+def out_of_stock(shortage: InventoryShortage) -> ApplicationError:
+    return ApplicationError(
+        f"Not enough {shortage.ingredient} for order {shortage.order_number}: "
+        f"{shortage.available} left, {shortage.requested} needed",
+        type="OutOfStockError",
+        non_retryable=True,
+    )
+
+
 class PizzaOrderActivities:
+    def __init__(
+        self,
+        distance_engine: Optional[DistanceEngine] = None,
+        bill_batcher: Optional[MicroBatcher] = None,
+        payment_gateway: Optional[PaymentGatewayClient] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        driver_service: Optional[DriverService] = None,
+        dispatch: Optional[DispatchEngine] = None,
+        inventory: Optional[InventoryStore] = None,
+        scoring_executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        self.distance_engine = distance_engine
+        self.bill_batcher = bill_batcher
+        self.payment_gateway = payment_gateway
+        self.idempotency_store = idempotency_store
+        self.driver_service = driver_service
+        self.dispatch = dispatch
+        self.inventory = inventory
+        self.scoring_executor = scoring_executor
+
     @activity.defn
+    @cached_activity(key=normalize_address, maxsize=10_000, ttl=3600)
     async def get_distance(self, address: Address) -> Distance:
         activity.logger.info(
             "Activity get_distance invoked; determining distance to customer address"
@@ -36,12 +88,40 @@ class PizzaOrderActivities:
         activity.logger.info(f"Activity get_distance complete: {distance}")
         return distance
 
+    @activity.defn
+    async def get_distances(self, addresses: List[Address]) -> List[Distance]:
+        # Batch version of get_distance, backed by a postal code centroid
+        # table so that many addresses cost a single vectorized computation
+        if self.distance_engine is None:
+            raise ApplicationError(
+                "No postal code centroid table is configured on this worker",
+                type="DistanceEngineUnavailableError",
+                non_retryable=True,
+            )
+
+        distances = self.distance_engine.distances(addresses)
+        activity.logger.info(f"Activity get_distances complete: {len(distances)}")
+        return distances
+
     @activity.defn
     async def send_bill(self, bill: Bill) -> OrderConfirmation:
         activity.logger.info(
             f"Activity send_bill invoked: customer: {bill.customer_id} amount: {bill.amount}"
         )
 
+        if self.bill_batcher is not None:
+            # Submitted to the billing backend together with the bills of
+            # other orders this worker is processing at the same time
+            result = await self.bill_batcher.submit(bill)
+            if isinstance(result, BillRejection):
+                activity.logger.error(result.message)
+                raise ApplicationError(
+                    result.message,
+                    type=result.error_type,
+                    non_retryable=True,
+                )
+            return result
+
         charge_amount = bill.amount
 
         if charge_amount > 3000:
@@ -70,10 +150,44 @@ class PizzaOrderActivities:
         return confirmation
 
     @activity.defn
+    async def score_fraud(self, check: FraudCheck) -> FraudScore:
+        # Scoring is CPU-bound. Run on the event loop, it would hold up every
+        # other activity and workflow task on this worker until it finished,
+        # so it goes to the scoring executor when the worker has one.
+        if self.scoring_executor is None:
+            result = score(check)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.scoring_executor, score, check
+            )
+
+        if result >= SUSPICIOUS_SCORE:
+            raise ApplicationError(
+                f"Order {check.order_number} looks fraudulent (score {result:.2f})",
+                type="FraudSuspectedError",
+                non_retryable=True,
+            )
+        activity.logger.info(f"Fraud score {result:.2f}")
+        return FraudScore(order_number=check.order_number, score=round(result, 4))
+
+    @activity.defn
+    @idempotent
     async def process_credit_card(
         self, charge_info: CreditCardCharge
     ) -> CreditCardConfirmation:
 
+        if self.payment_gateway is not None:
+            try:
+                return await self.payment_gateway.charge(
+                    charge_info,
+                    idempotency_key=idempotency_key("process_credit_card"),
+                )
+            except PaymentDeclinedError as e:
+                raise ApplicationError(str(e), type="CreditCardProcessingError")
+            except PaymentGatewayError as e:
+                # Retried according to the workflow's retry policy
+                raise ApplicationError(str(e), type="PaymentGatewayError")
+
         if len(charge_info.credit_card.number) == 16:
             card_processing_confirmation_number = "PAYME-78759"
             return CreditCardConfirmation(
@@ -99,40 +213,162 @@ class PizzaOrderActivities:
         Workflow know that progress is still being made. If the number matches a
         loop counter, it is a success. If it doesn't, then a delivery driver was
         unable to be contacted and failure is returned.
+
+        The heartbeat details are a DeliveryCheckpoint, so when the Activity is
+        retried it resumes from the last iteration the previous attempt
+        reported, with the same simulated outcome, instead of starting over.
+        The heartbeats go through a HeartbeatThrottle, which holds back the
+        ones that come sooner than the SDK would send them.
         """
-        success_simulation = random.randint(0, 14)
+        checkpoint = last_checkpoint(DeliveryCheckpoint)
+        if checkpoint is None:
+            checkpoint = DeliveryCheckpoint(
+                iteration=0, success_simulation=random.randint(0, 14)
+            )
+        else:
+            activity.logger.info(f"Resuming at iteration {checkpoint.iteration}")
 
-        for x in range(10):
-            if success_simulation == x:
-                # Pretend to use the `order` variable to notify the driver
-                activity.logger.info("Delivery driver responded")
-                return True
+        with HeartbeatThrottle() as heartbeats:
+            for x in range(checkpoint.iteration, 10):
+                if checkpoint.success_simulation == x:
+                    # Pretend to use the `order` variable to notify the driver
+                    activity.logger.info("Delivery driver responded")
+                    return True
 
-            # Assuming Activity.getExecutionContext().heartbeat is a valid function call in your context
-            activity.heartbeat(f"Heartbeat: {x}")
-            activity.logger.info(f"Heartbeat: {x}")
+                heartbeats.send(replace(checkpoint, iteration=x))
+                activity.logger.info(f"Heartbeat: {x}")
 
-            await asyncio.sleep(1)
+                await asyncio.sleep(1)
 
         activity.logger.info("Delivery driver didn't respond")
         return False
 
+    @activity.defn
+    async def request_delivery_driver(self, order: OrderConfirmation) -> bool:
+        # Hands the request to the driver service and returns right away,
+        # freeing this activity slot. The driver service completes the
+        # activity with its task token once a driver answers.
+        if self.driver_service is None:
+            raise ApplicationError(
+                "No driver service is configured on this worker",
+                type="DriverServiceUnavailableError",
+                non_retryable=True,
+            )
+
+        self.driver_service.request(activity.info().task_token, order)
+        activity.raise_complete_async()
+
+    @activity.defn
+    async def assign_delivery_driver(
+        self, request: DispatchRequest
+    ) -> DriverAssignment:
+        if self.dispatch is None:
+            raise ApplicationError(
+                "No dispatch engine is configured on this worker",
+                type="DispatchUnavailableError",
+                non_retryable=True,
+            )
+
+        location = None
+        if self.distance_engine is not None:
+            location = self.distance_engine.locate(request.address)
+        if location is None:
+            location = approximate_location(request.address)
+
+        match = self.dispatch.assign(*location)
+        if match is None:
+            activity.logger.info("No delivery driver is available")
+            return DriverAssignment(
+                order_number=request.order_number, driver_id=None, kilometers=0
+            )
+
+        driver, kilometers = match
+        self.dispatch.release_later(driver.driver_id, *location, kilometers)
+        activity.logger.info(
+            f"Assigned {driver.driver_id}, {kilometers:.1f} km away, "
+            f"to order {request.order_number}"
+        )
+        return DriverAssignment(
+            order_number=request.order_number,
+            driver_id=driver.driver_id,
+            kilometers=round(kilometers, 3),
+        )
+
     @activity.defn
     async def update_inventory(self, order: PizzaOrder) -> str:
         # Here you would call your inventory management system to reduce the stock
         # of your pizza ingredients.
+        if self.inventory is not None:
+            shortage = await self.inventory.update(
+                order, deduction_key(order.order_number)
+            )
+            if shortage is not None:
+                raise out_of_stock(shortage)
         activity.logger.info("Updated inventory")
         return "Updated inventory"
 
+    @activity.defn
+    async def reserve_inventory(self, order: PizzaOrder) -> str:
+        # Holds the ingredients for a while instead of deducting them for
+        # good; the hold expires unless commit_inventory confirms it
+        if self.inventory is not None:
+            shortage = await self.inventory.reserve(
+                order, deduction_key(order.order_number)
+            )
+            if shortage is not None:
+                raise out_of_stock(shortage)
+        activity.logger.info("Reserved inventory")
+        return "Reserved inventory"
+
+    @activity.defn
+    async def commit_inventory(self, order: PizzaOrder) -> str:
+        if self.inventory is not None:
+            if not await self.inventory.commit(deduction_key(order.order_number)):
+                raise ApplicationError(
+                    f"The inventory hold for order {order.order_number} expired",
+                    type="ReservationExpiredError",
+                    non_retryable=True,
+                )
+        activity.logger.info("Committed inventory")
+        return "Committed inventory"
+
     @activity.defn
     async def revert_inventory(self, order: PizzaOrder) -> str:
         # Here you would call your inventory management system to add the
         # ingredients back to your system after a failed order
+        if self.inventory is not None:
+            # Safe to repeat: an order is only ever put back once
+            await self.inventory.revert(deduction_key(order.order_number))
         activity.logger.info("Reverted changes to inventory")
         return "Reverted changes to inventory"
 
     @activity.defn
+    @idempotent
     async def refund_customer(self, credit_card_charge: CreditCardCharge) -> str:
         # Here you would refund your customer after a failed order.
         activity.logger.info("Customer refunded")
         return "Customer refunded"
+
+    @activity.defn
+    async def read_orders(self, page: OrderPage) -> OrderPageResult:
+        # Reads the next page of a corpus file for a batch workflow. In a
+        # plain file, seeking to the position returned by the previous page
+        # avoids rescanning the file from the start for every page. A .gz
+        # corpus can only seek by decompressing everything before the
+        # position, so each page of it costs more than the last; decompress
+        # large corpora before running a batch over them.
+        orders = []
+        with open_corpus(page.corpus_path, "r") as corpus:
+            corpus.seek(page.position)
+            while len(orders) < page.count:
+                line = corpus.readline()
+                if not line:
+                    break
+                if line.strip():
+                    orders.append(order_from_json(line))
+            next_position = corpus.tell()
+
+        activity.logger.info(
+            f"Read {len(orders)} orders from {page.corpus_path} at {page.position}"
+        )
+        return OrderPageResult(orders=orders, next_position=next_position)
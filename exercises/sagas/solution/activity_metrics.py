@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from collector import classify_failure
+from temporalio import activity
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+)
+
+
+class ActivityMetricsInterceptor(Interceptor):
+    """
+    Records metrics for every activity attempt the worker runs, through the
+    worker's metric meter, so they are exported alongside the SDK's own:
+
+    - `pizza_activity_latency`: how long the attempt ran
+    - `pizza_activity_attempt`: which attempt it was, 1 for the first
+    - `pizza_activity_failures`: failed attempts, by `error_type`, which is
+      the ApplicationError type or otherwise the exception's class name
+
+    The meter already labels each of them with the activity type and task
+    queue.
+    """
+
+    def intercept_activity(
+        self, next: ActivityInboundInterceptor
+    ) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInboundInterceptor(next)
+
+
+class _ActivityMetricsInboundInterceptor(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        began = time.monotonic()
+        # Cancellation and asynchronous completion end an attempt with a
+        # BaseException, and are neither failures nor a meaningful latency
+        try:
+            result = await super().execute_activity(input)
+        except Exception as e:
+            self._record(began, classify_failure(e))
+            raise
+        self._record(began)
+        return result
+
+    def _record(self, began: float, error_type: Optional[str] = None) -> None:
+        meter = activity.metric_meter()
+        meter.create_histogram_timedelta(
+            "pizza_activity_latency", "Time spent in each activity attempt", "ms"
+        ).record(timedelta(seconds=time.monotonic() - began))
+        meter.create_histogram(
+            "pizza_activity_attempt", "Attempt number of each activity attempt"
+        ).record(activity.info().attempt)
+        if error_type is not None:
+            meter.create_counter(
+                "pizza_activity_failures", "Failed activity attempts"
+            ).add(1, {"error_type": error_type})
@@ -0,0 +1,116 @@
+import asyncio
+from dataclasses import replace
+from datetime import timedelta
+
+from temporalio import workflow
+from temporalio.exceptions import ChildWorkflowError
+
+# Import activity, passing it through the sandbox without reloading the module
+with workflow.unsafe.imports_passed_through():
+    from activities import PizzaOrderActivities
+    from collector import classify_failure
+    from shared import (
+        BatchInput,
+        BatchSummary,
+        OrderOptions,
+        OrderPage,
+        PizzaOrder,
+    )
+    from workflow import PizzaOrderWorkflow
+
+
+@workflow.defn
+class PizzaBatchWorkflow:
+    """
+    Runs every order of a batch as a child PizzaOrderWorkflow, with at most
+    `max_concurrent_orders` children running at once. Orders are read a page
+    at a time, and the next page is read while the current one is still
+    running, so a child starts whenever a slot frees up, including across
+    pages. Once `orders_per_run` orders have been started (or the server
+    suggests it), the workflow lets them finish and continues as new so its
+    history stays small no matter how many orders the batch has.
+    """
+
+    def __init__(self) -> None:
+        self.summary = BatchSummary()
+
+    @workflow.run
+    async def run(self, batch: BatchInput) -> BatchSummary:
+        self.summary = batch.summary or BatchSummary()
+        slots = asyncio.Semaphore(batch.max_concurrent_orders)
+        running = set()
+        started_this_run = 0
+
+        next_page = asyncio.create_task(self._next_page(batch))
+        while True:
+            orders, batch = await next_page
+            if not orders:
+                await asyncio.gather(*running)
+                return self.summary
+
+            last_page = (
+                started_this_run + len(orders) >= batch.orders_per_run
+                or workflow.info().is_continue_as_new_suggested()
+            )
+            if not last_page:
+                # Read the next page while this one's orders wait for slots
+                next_page = asyncio.create_task(self._next_page(batch))
+
+            for order in orders:
+                # Taking the slot first keeps at most one page of orders
+                # waiting, however many pages have been read
+                await slots.acquire()
+                child = asyncio.create_task(
+                    self._run_order(order, batch.options, slots)
+                )
+                running.add(child)
+                child.add_done_callback(running.discard)
+            started_this_run += len(orders)
+
+            if last_page:
+                # The position carried over is past every order started so
+                # far, so all of them have to finish in this run
+                await asyncio.gather(*running)
+                workflow.logger.info(
+                    f"Continuing as new after {self.summary.processed} orders"
+                )
+                workflow.continue_as_new(replace(batch, summary=self.summary))
+
+    @workflow.query
+    def progress(self) -> BatchSummary:
+        return self.summary
+
+    async def _next_page(self, batch: BatchInput):
+        if batch.corpus_path is None:
+            orders = batch.orders[: batch.page_size]
+            return orders, replace(batch, orders=batch.orders[batch.page_size :])
+
+        page = await workflow.execute_activity_method(
+            PizzaOrderActivities.read_orders,
+            OrderPage(
+                corpus_path=batch.corpus_path,
+                position=batch.position,
+                count=batch.page_size,
+            ),
+            start_to_close_timeout=timedelta(seconds=30),
+        )
+        return page.orders, replace(batch, position=page.next_position)
+
+    async def _run_order(
+        self, order: PizzaOrder, options: OrderOptions, slots: asyncio.Semaphore
+    ) -> None:
+        # The slot was taken by run() before starting this order
+        try:
+            confirmation = await workflow.execute_child_workflow(
+                PizzaOrderWorkflow.order_pizza,
+                args=[order, options or OrderOptions()],
+                id=f"{workflow.info().workflow_id}-order-{order.order_number}",
+            )
+            outcome = confirmation.status
+        except ChildWorkflowError as e:
+            outcome = classify_failure(e)
+        finally:
+            slots.release()
+
+        self.summary.processed += 1
+        self.summary.outcomes[outcome] = self.summary.outcomes.get(outcome, 0) + 1
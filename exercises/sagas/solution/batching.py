@@ -0,0 +1,86 @@
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+ItemType = TypeVar("ItemType")
+ResultType = TypeVar("ResultType")
+
+
+class MicroBatcher(Generic[ItemType, ResultType]):
+    """
+    Collects items submitted by concurrent callers and hands them to
+    `submit_batch` together, once `max_batch_size` items are waiting or
+    `max_wait` seconds after the first one arrived, whichever comes first.
+    `submit_batch` returns one result per item, in order; each caller gets
+    its own result back, so a problem with one item never fails the others.
+    """
+
+    def __init__(
+        self,
+        submit_batch: Callable[[List[ItemType]], Awaitable[Sequence[ResultType]]],
+        max_batch_size: int = 100,
+        max_wait: float = 0.01,
+    ):
+        self.submit_batch = submit_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._waiting: List[Tuple[ItemType, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, item: ItemType) -> ResultType:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((item, future))
+
+        if len(self._waiting) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._submit(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _submit(self, batch: List[Tuple[ItemType, asyncio.Future]]) -> None:
+        # Callers that were cancelled while waiting are left out
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.submit_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> str:
+        average = self.items / self.batches if self.batches else 0.0
+        return (
+            f"batches: {self.batches} items: {self.items} average size: {average:.1f}"
+        )
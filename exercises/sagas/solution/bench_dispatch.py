@@ -0,0 +1,78 @@
+import argparse
+import math
+import random
+import time
+from collections import deque
+
+from dispatch import DispatchEngine, create_drivers
+from geo import STORE_LOCATION
+
+# Matches a stream of orders to drivers with the dispatch engine. Each
+# matched driver stays busy until `--busy` later orders have been matched,
+# then becomes free again at the customer's location, so the index keeps
+# changing the way it does in a real evening of deliveries. A sample of the
+# matches is checked against a scan over every free driver.
+
+
+def brute_force_nearest(index, lat, lon):
+    x, y = index._project(lat, lon)
+    best, best_km = None, math.inf
+    for driver in index.drivers.values():
+        dx, dy = index._project(driver.lat, driver.lon)
+        km = math.hypot(dx - x, dy - y)
+        if km < best_km:
+            best, best_km = driver, km
+    return best, best_km
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark driver dispatch")
+    parser.add_argument("--drivers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--busy", type=int, default=2_000)
+    parser.add_argument("--check-every", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    locations = [
+        (
+            STORE_LOCATION[0] + rng.gauss(0, 0.15),
+            STORE_LOCATION[1] + rng.gauss(0, 0.15),
+        )
+        for _ in range(args.orders)
+    ]
+    engine = DispatchEngine(create_drivers(args.drivers, seed=args.seed))
+    busy = deque()
+    checked = 0
+
+    began = time.perf_counter()
+    checking = 0.0
+    for number, (lat, lon) in enumerate(locations):
+        if len(busy) >= args.busy:
+            engine.release(*busy.popleft())
+
+        if number % args.check_every == 0:
+            started = time.perf_counter()
+            expected, expected_km = brute_force_nearest(engine.index, lat, lon)
+            checking += time.perf_counter() - started
+
+        match = engine.assign(lat, lon)
+        if match is None:
+            continue
+        driver, km = match
+        busy.append((driver.driver_id, lat, lon))
+
+        if number % args.check_every == 0:
+            # Ties can pick a different driver, but never a farther one
+            assert math.isclose(km, expected_km), (driver, expected)
+            checked += 1
+    elapsed = time.perf_counter() - began - checking
+
+    print(f"matched {engine.assignments:,} orders, {engine.unmatched:,} unmatched")
+    print(f"dispatch: {args.orders / elapsed:12,.0f} matches/s")
+    print(f"checked {checked} matches against a full scan")
+
+
+if __name__ == "__main__":
+    main()
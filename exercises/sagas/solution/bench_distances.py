@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from activities import PizzaOrderActivities
+from corpus import generate_orders
+from geo import DistanceEngine, build_centroid_table
+from temporalio.testing import ActivityEnvironment
+
+# Compares computing distances one address per get_distance call with a
+# single get_distances call for the whole batch. The activities are invoked
+# in-process, so the numbers show the cost of the computation itself and
+# leave out the per-activity round trip through the server, which makes the
+# gap even larger in a real worker.
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch distances")
+    parser.add_argument("--addresses", type=int, default=100_000)
+    parser.add_argument("--centroids", help="centroid table to use")
+    args = parser.parse_args()
+
+    addresses = [order.address for order in generate_orders(args.addresses, seed=1)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        centroids = args.centroids
+        if centroids is None:
+            centroids = os.path.join(directory, "centroids.npy")
+            build_centroid_table(centroids)
+
+        activities = PizzaOrderActivities(distance_engine=DistanceEngine(centroids))
+        env = ActivityEnvironment()
+
+        # Call the undecorated function so the distance cache doesn't hide
+        # the per-call cost
+        get_distance = PizzaOrderActivities.get_distance.__wrapped__
+
+        began = time.perf_counter()
+        for address in addresses:
+            await env.run(get_distance, activities, address)
+        single = time.perf_counter() - began
+
+        began = time.perf_counter()
+        distances = await env.run(activities.get_distances, addresses)
+        batch = time.perf_counter() - began
+
+    assert len(distances) == len(addresses)
+    print(f"get_distance:  {len(addresses) / single:12,.0f} addresses/s")
+    print(f"get_distances: {len(addresses) / batch:12,.0f} addresses/s")
+    print(f"speedup: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
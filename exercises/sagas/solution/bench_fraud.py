@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import time
+
+from activities import PizzaOrderActivities
+from corpus import generate_orders
+from fraud import create_scoring_executor
+from loadgen import percentile
+from shared import FraudCheck
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import ActivityEnvironment
+
+# Runs score_fraud for many orders at once while a probe measures how late
+# the event loop wakes it up. On a worker, that lateness is added to every
+# other activity and workflow task waiting on the same loop. Each executor
+# kind is created (and pre-warmed) before its run starts, the way the worker
+# creates it at startup.
+
+
+async def probe(lags, interval, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+
+async def run(kind, checks, concurrency, workers):
+    executor = create_scoring_executor(kind, workers)
+    activities = PizzaOrderActivities(scoring_executor=executor)
+    env = ActivityEnvironment()
+    queue = list(checks)
+    refused = 0
+
+    async def runner():
+        nonlocal refused
+        while queue:
+            try:
+                await env.run(activities.score_fraud, queue.pop())
+            except ApplicationError:
+                refused += 1
+
+    lags = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(lags, 0.001, stop))
+    began = time.perf_counter()
+    await asyncio.gather(*(runner() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    stop.set()
+    await prober
+    if executor is not None:
+        executor.shutdown()
+    return len(checks) / elapsed, lags, refused
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark fraud scoring executors")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executors", default="inline,thread,process")
+    args = parser.parse_args()
+
+    checks = [
+        FraudCheck(
+            order_number=order.order_number,
+            amount=sum(pizza.price for pizza in order.items),
+            card_number=order.credit_card_info.number,
+            postal_code=order.address.postal_code,
+            items=len(order.items),
+        )
+        for order in generate_orders(args.orders, seed=1)
+    ]
+
+    for kind in args.executors.split(","):
+        rate, lags, refused = await run(kind, checks, args.concurrency, args.workers)
+        print(
+            f"{kind:8} {rate:8,.1f} scores/s  refused: {refused:4}"
+            f"  loop lag p50 {percentile(lags, 50) * 1000:7.2f} ms"
+            f"  p99 {percentile(lags, 99) * 1000:7.2f} ms"
+            f"  max {max(lags, default=0) * 1000:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
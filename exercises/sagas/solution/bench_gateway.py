@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import time
+
+from activities import PizzaOrderActivities
+from gateway import PaymentGatewayClient
+from shared import Bill, CreditCardCharge, CreditCardInfo
+from stub_gateway import start_stub_gateway
+from temporalio.testing import ActivityEnvironment
+
+# Runs process_credit_card against the stub gateway, once with the shared,
+# pooled client the worker uses and once opening a new client per charge,
+# and reports charges per second and how often connections were reused.
+
+
+def create_charge(index: int) -> CreditCardCharge:
+    return CreditCardCharge(
+        bill=Bill(
+            customer_id=8675309,
+            order_number=f"XD{index:08d}",
+            description="Pizza order",
+            amount=4000,
+        ),
+        credit_card=CreditCardInfo(
+            holderName="Lisa Anderson", number="4242424242424242"
+        ),
+    )
+
+
+async def run_charges(url: str, charges: int, concurrency: int, pooled: bool):
+    env = ActivityEnvironment()
+    shared_client = PaymentGatewayClient(url, max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"created": 0, "reused": 0}
+
+    async def charge(index: int):
+        async with semaphore:
+            client = shared_client if pooled else PaymentGatewayClient(url)
+            activities = PizzaOrderActivities(payment_gateway=client)
+            await env.run(activities.process_credit_card, create_charge(index))
+            if not pooled:
+                totals["created"] += client.connections_created
+                await client.close()
+
+    began = time.perf_counter()
+    await asyncio.gather(*(charge(i) for i in range(charges)))
+    elapsed = time.perf_counter() - began
+
+    if pooled:
+        totals["created"] = shared_client.connections_created
+        totals["reused"] = shared_client.connections_reused
+    await shared_client.close()
+
+    connections = totals["created"] + totals["reused"]
+    return charges / elapsed, totals["reused"] / connections if connections else 0.0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the payment gateway client")
+    parser.add_argument("--charges", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="stub gateway seconds per charge"
+    )
+    args = parser.parse_args()
+
+    runner = await start_stub_gateway(port=args.port, latency=args.latency)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        for name, pooled in (("pooled client", True), ("client per charge", False)):
+            rate, reuse = await run_charges(url, args.charges, args.concurrency, pooled)
+            print(f"{name:18} {rate:10,.0f} charges/s  connection reuse {reuse:.1%}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
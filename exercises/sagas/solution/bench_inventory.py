@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter
+
+from corpus import generate_orders
+from inventory import DEFAULT_STOCK, InventoryStore, order_ingredients
+
+# Runs inventory updates the way a fleet of workers would: several processes
+# share one inventory database, each with many orders in flight, and some
+# orders are reverted as if a later step had failed. Running it with a batch
+# size of 1 and then with larger batches shows how much of the throughput
+# limit comes from contention on the database. Afterwards the stock left in
+# the database is checked against the deductions that were kept.
+
+
+async def run_process(path, process, orders, concurrency, batch_size, revert_every):
+    store = InventoryStore(path, max_batch_size=batch_size)
+    queue = list(generate_orders(orders, seed=process, prefix=f"P{process}-"))
+    kept = Counter()
+
+    async def runner():
+        while queue:
+            order = queue.pop()
+            # Order numbers are unique here, so they can serve as the keys
+            shortage = await store.update(order, order.order_number)
+            if shortage is not None:
+                continue
+            if int(order.order_number[-8:]) % revert_every == 0:
+                await store.revert(order.order_number)
+                # Repeating a revert must not put anything back twice
+                await store.revert(order.order_number)
+            else:
+                kept.update(order_ingredients(order))
+
+    await asyncio.gather(*(runner() for _ in range(concurrency)))
+    conflicts = store.conflicts
+    store.close()
+    return kept, conflicts
+
+
+def process_main(args):
+    return asyncio.run(run_process(*args))
+
+
+def run(path, processes, orders, concurrency, batch_size, revert_every):
+    work = [
+        (path, process, orders, concurrency, batch_size, revert_every)
+        for process in range(processes)
+    ]
+    began = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(process_main, work)
+    elapsed = time.perf_counter() - began
+
+    kept = Counter()
+    conflicts = 0
+    for process_kept, process_conflicts in results:
+        kept.update(process_kept)
+        conflicts += process_conflicts
+
+    store = InventoryStore(path)
+    stock = store.stock()
+    store.close()
+    for name, quantity in stock.items():
+        assert quantity == DEFAULT_STOCK - kept[name], (name, quantity, kept[name])
+    return processes * orders / elapsed, conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inventory store")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=5_000, help="per process")
+    parser.add_argument("--concurrency", type=int, default=200, help="per process")
+    parser.add_argument("--batch-sizes", default="1,10,100")
+    parser.add_argument("--revert-every", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            path = os.path.join(directory, f"inventory-{batch_size}.db")
+            rate, conflicts = run(
+                path,
+                args.processes,
+                args.orders,
+                args.concurrency,
+                batch_size,
+                args.revert_every,
+            )
+            print(
+                f"batch size {batch_size:4}: {rate:10,.0f} orders/s"
+                f"  {conflicts:6,} conflicts"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from activities import PizzaOrderActivities
+from loadgen import percentile, start_order
+from shared import OrderOptions, create_pizza_order
+from temporalio.api.enums.v1 import EventType
+from temporalio.client import Client, WorkflowFailureError
+from worker import create_driver_worker, create_worker
+
+logging.basicConfig(level=logging.INFO)
+
+# Compares running get_distance as a regular activity and as a local activity.
+# Besides end-to-end latency, it reports the number of history events per
+# order and the time from the workflow starting until the preparation timer
+# is started, which is the part of the order that get_distance sits on.
+
+
+async def run_order(client: Client, index: int, options: OrderOptions, run_id: int):
+    order = create_pizza_order()
+    order.order_number = f"{order.order_number}-bench-{run_id}-{index}"
+    # Use a card that is accepted so every order runs to completion
+    order.credit_card_info.number = "4242424242424242"
+
+    began = time.monotonic()
+    handle = await start_order(client, order, options)
+    try:
+        await handle.result()
+    except WorkflowFailureError:
+        pass
+    latency = time.monotonic() - began
+
+    history = await handle.fetch_history()
+    started = history.events[0].event_time.ToDatetime()
+    timer_started = next(
+        event.event_time.ToDatetime()
+        for event in history.events
+        if event.event_type == EventType.EVENT_TYPE_TIMER_STARTED
+    )
+    return len(history.events), (timer_started - started).total_seconds(), latency
+
+
+async def run_mode(
+    client: Client, options: OrderOptions, orders: int, concurrency: int
+):
+    run_id = int(time.time())
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int):
+        async with semaphore:
+            return await run_order(client, index, options, run_id)
+
+    results = await asyncio.gather(*(limited(i) for i in range(orders)))
+    events, to_distance, latencies = zip(*results)
+    return statistics.mean(events), list(to_distance), list(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark get_distance as a local activity"
+    )
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    client = await Client.connect("localhost:7233", namespace="default")
+
+    modes = {
+        "activity": OrderOptions(),
+        "local activity": OrderOptions(local_activities=["get_distance"]),
+    }
+
+    activities = PizzaOrderActivities()
+    async with create_worker(client, activities), create_driver_worker(
+        client, activities
+    ):
+        for name, options in modes.items():
+            events, to_distance, latencies = await run_mode(
+                client, options, args.orders, args.concurrency
+            )
+            logging.info(
+                f"{name}: {events:.1f} history events/order, "
+                f"start to distance p50: {percentile(to_distance, 50) * 1000:.1f}ms "
+                f"p95: {percentile(to_distance, 95) * 1000:.1f}ms, "
+                f"end to end p50: {percentile(latencies, 50):.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
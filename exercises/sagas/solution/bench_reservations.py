@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+from activities import PizzaOrderActivities
+from corpus import generate_orders
+from inventory import DEFAULT_STOCK, InventoryStore, order_ingredients
+from loadgen import percentile
+from shared import Bill, CreditCardCharge
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import ActivityEnvironment
+
+# Compares the two inventory modes of the order workflow when 20% of the
+# cards are declined. Each order runs the inventory, charge and (in
+# reservation mode) commit steps the way the workflow does, and a declined
+# card runs the workflow's compensations concurrently, which in reservation
+# mode is none at all. Every activity call pays --activity-latency on top of
+# its own work, standing in for the round trip through the task queue. At the
+# end, once the sweeper has expired the holds of failed orders, the stock is
+# checked against the orders that went through.
+
+
+class Run:
+    def __init__(self, activities: PizzaOrderActivities, latency: float):
+        self.activities = activities
+        self.latency = latency
+        self.env = ActivityEnvironment()
+        self.activity_calls = 0
+        self.compensations = 0
+        self.latencies = {True: [], False: []}
+        self.kept = Counter()
+
+    async def call(self, activity, arg):
+        self.activity_calls += 1
+        await asyncio.sleep(self.latency)
+        return await self.env.run(activity, arg)
+
+    async def order(self, order, reserve: bool):
+        activities = self.activities
+        began = time.perf_counter()
+        compensations = []
+        if reserve:
+            await self.call(activities.reserve_inventory, order)
+        else:
+            compensations += [activities.refund_customer, activities.revert_inventory]
+            await self.call(activities.update_inventory, order)
+
+        bill = Bill(
+            customer_id=order.customer.customer_id,
+            order_number=order.order_number,
+            description="Pizza order",
+            amount=sum(pizza.price for pizza in order.items),
+        )
+        charge = CreditCardCharge(bill=bill, credit_card=order.credit_card_info)
+        try:
+            try:
+                await self.call(activities.process_credit_card, charge)
+            except ApplicationError as e:
+                # As in the workflow, reservation mode only refunds a charge
+                # that may have gone through, never a declined card
+                if reserve and e.type != "CreditCardProcessingError":
+                    compensations.append(activities.refund_customer)
+                raise
+            if reserve:
+                compensations.append(activities.refund_customer)
+                await self.call(activities.commit_inventory, order)
+            succeeded = True
+            self.kept.update(order_ingredients(order))
+        except ApplicationError:
+            args = {
+                activities.refund_customer: charge,
+                activities.revert_inventory: order,
+            }
+            self.compensations += len(compensations)
+            await asyncio.gather(
+                *(self.call(activity, args[activity]) for activity in compensations)
+            )
+            succeeded = False
+        self.latencies[succeeded].append(time.perf_counter() - began)
+
+
+async def run_mode(path, orders, concurrency, latency, hold, reserve):
+    inventory = InventoryStore(path, hold=hold)
+    sweeper = asyncio.create_task(inventory.sweep(interval=hold / 2))
+    run = Run(PizzaOrderActivities(inventory=inventory), latency)
+    queue = list(orders)
+
+    async def runner():
+        while queue:
+            await run.order(queue.pop(), reserve)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(runner() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+
+    # Give the sweeper time to expire the holds left by declined cards
+    await asyncio.sleep(hold * 2)
+    sweeper.cancel()
+    for name, quantity in inventory.stock().items():
+        assert quantity == DEFAULT_STOCK - run.kept[name], (name, quantity)
+    expired = inventory.expired
+    inventory.close()
+    return run, elapsed, expired
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark inventory reservations")
+    parser.add_argument("--orders", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--invalid-card-ratio", type=float, default=0.2)
+    parser.add_argument("--activity-latency", type=float, default=0.01)
+    parser.add_argument("--hold", type=float, default=1.0)
+    args = parser.parse_args()
+
+    orders = list(
+        generate_orders(args.orders, seed=1, invalid_card_ratio=args.invalid_card_ratio)
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, reserve in [("revert", False), ("reserve", True)]:
+            run, elapsed, expired = await run_mode(
+                os.path.join(directory, f"{name}.db"),
+                orders,
+                args.concurrency,
+                args.activity_latency,
+                args.hold,
+                reserve,
+            )
+            failed = len(run.latencies[False])
+            print(
+                f"{name:8} {args.orders / elapsed:8,.0f} orders/s"
+                f"  activities: {run.activity_calls:,}"
+                f"  compensations: {run.compensations:,}"
+                f" ({run.compensations / max(failed, 1):.1f} per failed order)"
+                f"  expired holds: {expired:,}"
+            )
+            for succeeded, label in [(True, "succeeded"), (False, "failed")]:
+                samples = sorted(run.latencies[succeeded])
+                print(
+                    f"         {label:9} {len(samples):6,} orders"
+                    f"  p50 {percentile(samples, 50) * 1000:6.1f} ms"
+                    f"  p99 {percentile(samples, 99) * 1000:6.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
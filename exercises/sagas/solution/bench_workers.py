@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import logging
+
+from launcher import WorkerLauncher
+from loadgen import add_order_options, order_options
+from starter import run_load
+from temporalio.client import Client
+
+# Measures order throughput with 1, 2, ... up to --max-processes worker
+# processes on this host. For each count it starts the workers with the
+# launcher, gives them --warmup seconds to connect and start polling, runs
+# the same closed-loop load as `starter.py --orders`, and stops them again.
+# Needs a Temporal server on localhost:7233 and nothing else polling
+# pizza-tasks. Orders spend most of their time in timers and the driver
+# notification unless --async-driver-notification is used, so use enough
+# --concurrency to keep the workers busy.
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker process counts")
+    parser.add_argument("--max-processes", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("worker_args", nargs=argparse.REMAINDER)
+    add_order_options(parser)
+    args = parser.parse_args()
+    worker_args = args.worker_args
+    if worker_args[:1] == ["--"]:
+        worker_args = worker_args[1:]
+
+    client = await Client.connect("localhost:7233", namespace="default")
+    results = []
+    for processes in range(1, args.max_processes + 1):
+        launcher = WorkerLauncher(processes, worker_args)
+        workers = asyncio.create_task(launcher.run())
+        await asyncio.sleep(args.warmup)
+        try:
+            stats = await run_load(
+                client,
+                args.orders,
+                args.concurrency,
+                options=order_options(args),
+            )
+        finally:
+            await launcher.stop()
+            await workers
+        logging.info(f"{processes} worker processes:\n{stats.report()}")
+        results.append((processes, stats.completion_rate(), launcher.restarts))
+
+    baseline = results[0][1]
+    for processes, rate, restarts in results:
+        print(
+            f"{processes:3} processes: {rate:8.1f} orders/s"
+            f"  ({rate / baseline if baseline else 0:.2f}x)  restarts: {restarts}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+import asyncio
+from dataclasses import dataclass
+from time import time
+from typing import List, Union
+
+from shared import Bill, OrderConfirmation
+
+
+@dataclass
+class BillRejection:
+    order_number: str
+    error_type: str
+    message: str
+
+
+BillResult = Union[OrderConfirmation, BillRejection]
+
+
+class BillingBackend:
+    """
+    A local stand-in for a billing system that accepts bills in bulk. Every
+    call costs a fixed round trip plus a small amount per bill, which is what
+    makes submitting bills together worthwhile. Each bill is accepted or
+    rejected on its own.
+    """
+
+    def __init__(self, call_latency: float = 0.02, per_bill_latency: float = 0.0001):
+        self.call_latency = call_latency
+        self.per_bill_latency = per_bill_latency
+        self.calls = 0
+        self.bills = 0
+
+    async def submit_bills(self, bills: List[Bill]) -> List[BillResult]:
+        self.calls += 1
+        self.bills += len(bills)
+        await asyncio.sleep(self.call_latency + self.per_bill_latency * len(bills))
+        return [self._bill(bill) for bill in bills]
+
+    def _bill(self, bill: Bill) -> BillResult:
+        # The same rules send_bill applies when billing one order at a time
+        charge_amount = bill.amount
+
+        if charge_amount > 3000:
+            charge_amount -= 500
+
+        if charge_amount < 0:
+            return BillRejection(
+                order_number=bill.order_number,
+                error_type="InvalidChargeAmountError",
+                message=f"Invalid charge amount: {charge_amount}",
+            )
+
+        return OrderConfirmation(
+            order_number=bill.order_number,
+            status="SUCCESS",
+            confirmation_number="P24601",
+            billing_timestamp=time(),
+            amount=charge_amount,
+        )
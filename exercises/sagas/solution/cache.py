@@ -0,0 +1,94 @@
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from shared import Address
+
+
+class TTLCache:
+    """
+    A least-recently-used cache whose entries also expire `ttl` seconds
+    after they were stored. Hits and misses are counted so the hit rate can
+    be reported.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"size: {len(self)} hits: {self.hits} misses: {self.misses} "
+            f"evictions: {self.evictions} hit rate: {hit_rate:.1%}"
+        )
+
+
+def normalize_address(address: Address) -> tuple:
+    # Treat addresses that only differ in case or spacing as the same address
+    return tuple(
+        " ".join(part.split()).lower()
+        for part in (
+            address.line1,
+            address.line2,
+            address.city,
+            address.state,
+            address.postal_code,
+        )
+    )
+
+
+def cached_activity(
+    key: Callable[[Any], Hashable], maxsize: int = 10_000, ttl: float = 3600.0
+):
+    """
+    Caches the result of an idempotent async activity method, keyed on
+    `key(arg)`. Apply it below @activity.defn. The cache is shared by every
+    invocation in the worker process and is available as the `cache`
+    attribute of the decorated method.
+    """
+
+    def decorator(fn):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        @functools.wraps(fn)
+        async def wrapper(self, arg):
+            cache_key = key(arg)
+            result = cache.get(cache_key)
+            if result is None:
+                result = await fn(self, arg)
+                cache.put(cache_key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
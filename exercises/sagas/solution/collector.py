@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from typing import IO, Optional
+
+from shared import OrderConfirmation
+from temporalio.client import Client, WorkflowHandle
+from temporalio.exceptions import ApplicationError
+
+SUCCESS = "SUCCESS"
+DELIVERY_FAILURE = "DELIVERY FAILURE"
+
+
+def classify_failure(error: BaseException) -> str:
+    # Walk the cause chain (workflow failure -> activity failure -> ...) and
+    # report the first typed application error, such as
+    # CreditCardProcessingError or InvalidChargeAmountError. A failed
+    # rollback is reported as what made the order roll back, if anything.
+    innermost = error
+    cause: Optional[BaseException] = error
+    while cause is not None:
+        if isinstance(cause, ApplicationError) and cause.type:
+            if cause.type != "CompensationError" or cause.cause is None:
+                return cause.type
+        innermost = cause
+        next_cause = getattr(cause, "cause", None)
+        cause = next_cause if next_cause is not None else cause.__cause__
+    return type(innermost).__name__
+
+
+class ResultCollector:
+    # Awaits workflow results concurrently and records each one as soon as it
+    # finishes, so one slow order never holds up reporting for the others
+
+    def __init__(self, sink: Optional[IO[str]] = None, max_pending: int = 1000):
+        self.sink = sink
+        self.outcomes: Counter = Counter()
+        self._pending_slots = asyncio.Semaphore(max_pending)
+        self._pending = set()
+
+    async def collect(
+        self, handle: WorkflowHandle, began: Optional[float] = None
+    ) -> str:
+        began = time.monotonic() if began is None else began
+        try:
+            result = await handle.result()
+            outcome = result.status
+        except Exception as e:
+            outcome = classify_failure(e)
+
+        self.outcomes[outcome] += 1
+        if self.sink is not None:
+            record = {
+                "workflow_id": handle.id,
+                "outcome": outcome,
+                "latency": round(time.monotonic() - began, 6),
+            }
+            self.sink.write(json.dumps(record) + "\n")
+        return outcome
+
+    async def add(self, handle: WorkflowHandle) -> None:
+        # Waits while `max_pending` results are outstanding, which bounds
+        # memory when collecting for a very large number of workflows
+        await self._pending_slots.acquire()
+        task = asyncio.create_task(self.collect(handle))
+        self._pending.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        self._pending_slots.release()
+
+    async def drain(self) -> None:
+        await asyncio.gather(*self._pending)
+
+    def summary(self) -> str:
+        total = sum(self.outcomes.values())
+        lines = [f"Results collected: {total}"]
+        for outcome, count in self.outcomes.most_common():
+            lines.append(f"  {outcome}: {count}")
+        return "\n".join(lines)
+
+
+def is_failure(outcome: str) -> bool:
+    return outcome not in (SUCCESS, DELIVERY_FAILURE)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Collect pizza order results as the workflows complete"
+    )
+    parser.add_argument(
+        "--query",
+        default="WorkflowType='PizzaOrderWorkflow'",
+        help="visibility query selecting the workflows to collect",
+    )
+    parser.add_argument(
+        "--sink", default="-", help="file to append results to, or - for stdout"
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=1000,
+        help="maximum number of results awaited at once",
+    )
+    args = parser.parse_args()
+
+    client = await Client.connect("localhost:7233", namespace="default")
+
+    sink = sys.stdout if args.sink == "-" else open(args.sink, "a")
+    collector = ResultCollector(sink, args.max_pending)
+    try:
+        async for execution in client.list_workflows(args.query):
+            await collector.add(
+                client.get_workflow_handle(
+                    execution.id,
+                    run_id=execution.run_id,
+                    result_type=OrderConfirmation,
+                )
+            )
+        await collector.drain()
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+    logging.info(collector.summary())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
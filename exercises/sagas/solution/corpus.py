@@ -0,0 +1,165 @@
+import argparse
+import dataclasses
+import gzip
+import itertools
+import json
+import random
+import sys
+from copy import deepcopy
+from typing import IO, Iterable, Iterator, Optional
+
+from shared import (
+    Address,
+    CreditCardInfo,
+    Customer,
+    Pizza,
+    PizzaOrder,
+    create_pizza_order,
+)
+from temporalio.converter import value_to_type
+
+# A corpus file is JSON Lines: one PizzaOrder per line, gzip-compressed when
+# the file name ends in ".gz". Reading and writing both stream one order at a
+# time, so the size of the corpus is only limited by disk space.
+
+FIRST_NAMES = ["Lisa", "Omar", "Priya", "Chen", "Maria", "Kwame", "Ingrid", "Sam"]
+LAST_NAMES = ["Anderson", "Haddad", "Raman", "Wei", "Lopez", "Mensah", "Berg"]
+STREETS = ["Elm", "Evergreen", "Rio Grande", "Central", "Juan Tabo", "Montgomery"]
+STREET_TYPES = ["St", "Ave", "Blvd", "Terrace", "Road", "Parkway"]
+UNITS = ["", "", "Apt 4", "Unit 12B", "Apartment 221B", "Suite 1400, Rear Entrance"]
+CITIES = [("Albuquerque", "NM"), ("Rio Rancho", "NM"), ("Santa Fe", "NM")]
+SIZES = {"Small": 1000, "Medium": 1300, "Large": 1500}
+TOPPINGS = ["pepperoni", "mushrooms", "onions", "extra cheese", "olives", "ham"]
+TOPPING_PRICE = 100
+
+
+def generate_orders(
+    count: int, seed: int = 0, invalid_card_ratio: float = 0.1, prefix: str = "XD"
+) -> Iterator[PizzaOrder]:
+    rng = random.Random(seed)
+
+    for index in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        name = f"{first} {last}"
+        customer = Customer(
+            customer_id=rng.randint(1_000_000, 9_999_999),
+            name=name,
+            email=f"{first.lower()}.{last.lower()}@example.com",
+            phone=f"555-555-{rng.randint(0, 9999):04d}",
+        )
+
+        # get_distance derives the distance from the length of the address
+        # lines, so varying them spreads orders across distances, including
+        # some outside the service area.
+        city, state = rng.choice(CITIES)
+        address = Address(
+            line1=f"{rng.randint(1, 99999)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}",
+            line2=rng.choice(UNITS),
+            city=city,
+            state=state,
+            postal_code=f"87{rng.randint(100, 199)}",
+        )
+
+        items = []
+        for _ in range(rng.randint(1, 5)):
+            size = rng.choice(list(SIZES))
+            toppings = rng.sample(TOPPINGS, rng.randint(0, 3))
+            description = size
+            if toppings:
+                description += ", with " + " and ".join(toppings)
+            items.append(
+                Pizza(
+                    description=description,
+                    price=SIZES[size] + TOPPING_PRICE * len(toppings),
+                )
+            )
+
+        # process_credit_card only accepts 16 digit card numbers
+        digits = 15 if rng.random() < invalid_card_ratio else 16
+        card_number = "4" + "".join(str(rng.randint(0, 9)) for _ in range(digits - 1))
+
+        yield PizzaOrder(
+            order_number=f"{prefix}{index:08d}",
+            customer=customer,
+            items=items,
+            is_delivery=rng.random() < 0.8,
+            address=address,
+            credit_card_info=CreditCardInfo(holderName=name, number=card_number),
+        )
+
+
+def order_to_json(order: PizzaOrder) -> str:
+    return json.dumps(dataclasses.asdict(order), separators=(",", ":"))
+
+
+def order_from_json(line: str) -> PizzaOrder:
+    return value_to_type(PizzaOrder, json.loads(line), [])
+
+
+def open_corpus(path: str, mode: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_corpus(path: str, orders: Iterable[PizzaOrder]) -> int:
+    written = 0
+    corpus = open_corpus(path, "w")
+    try:
+        for order in orders:
+            corpus.write(order_to_json(order) + "\n")
+            written += 1
+    finally:
+        if corpus is not sys.stdout:
+            corpus.close()
+    return written
+
+
+def read_corpus(path: str) -> Iterator[PizzaOrder]:
+    corpus = open_corpus(path, "r")
+    try:
+        for line in corpus:
+            if line.strip():
+                yield order_from_json(line)
+    finally:
+        if corpus is not sys.stdin:
+            corpus.close()
+
+
+def order_source(path: Optional[str] = None) -> Iterator[PizzaOrder]:
+    # Orders for the load drivers: replay a corpus when one is given, or
+    # repeat the sample order from shared.py forever. Its card is one digit
+    # short for the exercise, so use one that is accepted instead, or every
+    # order would fail.
+    if path:
+        return read_corpus(path)
+    template = create_pizza_order()
+    template.credit_card_info.number = "4242424242424242"
+    return (deepcopy(template) for _ in itertools.count())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a seeded corpus of synthetic pizza orders"
+    )
+    parser.add_argument("path", help="output file (.gz to compress, - for stdout)")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--invalid-card-ratio",
+        type=float,
+        default=0.1,
+        help="fraction of orders with a card number that will be declined",
+    )
+    args = parser.parse_args()
+
+    orders = generate_orders(args.count, args.seed, args.invalid_card_ratio)
+    written = write_corpus(args.path, orders)
+    print(f"Wrote {written} orders to {args.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from geo import STORE_LOCATION
+
+KM_PER_DEGREE_LAT = 110.57
+
+
+@dataclass
+class Driver:
+    driver_id: str
+    lat: float
+    lon: float
+
+
+class DriverIndex:
+    """
+    A uniform grid over the delivery area holding the drivers that are
+    currently free. Finding the nearest one searches outward from the
+    order's cell one ring of cells at a time and stops as soon as no
+    unvisited ring can hold anything closer, so a lookup only touches the
+    few cells around the order rather than every driver.
+    """
+
+    def __init__(self, cell_size_km: float = 1.0, origin=STORE_LOCATION):
+        self.cell_size_km = cell_size_km
+        # Project onto a flat plane around the origin; at city scale the
+        # error is negligible
+        self.km_per_degree_lon = KM_PER_DEGREE_LAT * math.cos(math.radians(origin[0]))
+        self.cells: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self.drivers: Dict[str, Driver] = {}
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.drivers)
+
+    def _project(self, lat: float, lon: float) -> Tuple[float, float]:
+        return lon * self.km_per_degree_lon, lat * KM_PER_DEGREE_LAT
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size_km), math.floor(y / self.cell_size_km)
+
+    def add(self, driver: Driver) -> None:
+        cell = self._cell(*self._project(driver.lat, driver.lon))
+        self.cells[cell].add(driver.driver_id)
+        self.drivers[driver.driver_id] = driver
+
+        # The bounding box of occupied cells limits how far a search goes
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            min_x, min_y, max_x, max_y = self._bounds
+            self._bounds = (
+                min(min_x, cell[0]),
+                min(min_y, cell[1]),
+                max(max_x, cell[0]),
+                max(max_y, cell[1]),
+            )
+
+    def remove(self, driver_id: str) -> Driver:
+        driver = self.drivers.pop(driver_id)
+        cell = self._cell(*self._project(driver.lat, driver.lon))
+        self.cells[cell].discard(driver_id)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        return driver
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[Driver, float]]:
+        if not self.drivers:
+            return None
+
+        x, y = self._project(lat, lon)
+        cx, cy = self._cell(x, y)
+        min_x, min_y, max_x, max_y = self._bounds
+        max_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+
+        best: Optional[Driver] = None
+        best_km = math.inf
+        for ring in range(max_ring + 1):
+            # Every cell in this ring is at least (ring - 1) cells away
+            if best is not None and best_km <= (ring - 1) * self.cell_size_km:
+                break
+            # When free drivers are sparse, checking each of them is cheaper
+            # than visiting the empty cells between them
+            if (2 * ring + 1) ** 2 > len(self.drivers):
+                return self._closest(x, y, self.drivers.values())
+            for cell in self._ring(cx, cy, ring):
+                for driver_id in self.cells.get(cell, ()):
+                    driver = self.drivers[driver_id]
+                    dx, dy = self._project(driver.lat, driver.lon)
+                    km = math.hypot(dx - x, dy - y)
+                    if km < best_km:
+                        best, best_km = driver, km
+
+        return (best, best_km) if best is not None else None
+
+    def _closest(
+        self, x: float, y: float, drivers: Iterable[Driver]
+    ) -> Optional[Tuple[Driver, float]]:
+        best: Optional[Driver] = None
+        best_km = math.inf
+        for driver in drivers:
+            dx, dy = self._project(driver.lat, driver.lon)
+            km = math.hypot(dx - x, dy - y)
+            if km < best_km:
+                best, best_km = driver, km
+        return (best, best_km) if best is not None else None
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+
+class DispatchEngine:
+    """
+    Matches orders to the nearest free driver. A matched driver is taken out
+    of the index until the delivery is done, and is then free again at the
+    customer's location.
+    """
+
+    def __init__(self, index: DriverIndex, minutes_per_km: float = 0.0):
+        self.index = index
+        self.minutes_per_km = minutes_per_km
+        self.busy: Dict[str, Driver] = {}
+        self.assignments = 0
+        self.unmatched = 0
+
+    def assign(self, lat: float, lon: float) -> Optional[Tuple[Driver, float]]:
+        match = self.index.nearest(lat, lon)
+        if match is None:
+            self.unmatched += 1
+            return None
+
+        driver, km = match
+        self.busy[driver.driver_id] = self.index.remove(driver.driver_id)
+        self.assignments += 1
+        return driver, km
+
+    def release(self, driver_id: str, lat: float, lon: float) -> None:
+        driver = self.busy.pop(driver_id)
+        driver.lat, driver.lon = lat, lon
+        self.index.add(driver)
+
+    def release_later(self, driver_id: str, lat: float, lon: float, km: float) -> None:
+        # Simulates the delivery taking time proportional to the distance
+        delay = km * self.minutes_per_km * 60
+        asyncio.get_running_loop().call_later(delay, self.release, driver_id, lat, lon)
+
+
+def create_drivers(count: int, seed: int = 0, spread: float = 0.15) -> DriverIndex:
+    # Scatters drivers around the store the same way geo scatters postal codes
+    rng = random.Random(seed)
+    index = DriverIndex()
+    for number in range(count):
+        index.add(
+            Driver(
+                driver_id=f"driver-{number}",
+                lat=STORE_LOCATION[0] + rng.gauss(0, spread),
+                lon=STORE_LOCATION[1] + rng.gauss(0, spread),
+            )
+        )
+    return index
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import random
+from typing import Dict
+
+from shared import OrderConfirmation
+from temporalio.client import Client
+
+
+class DriverService:
+    """
+    A local stand-in for the system that asks delivery drivers to pick up an
+    order. Requests are remembered by the task token of the activity that
+    made them, and the activity is completed through the client once a
+    driver answers. Waiting costs one timer per request, not an activity
+    slot, so thousands of requests can be pending at once.
+    """
+
+    def __init__(self, client: Client, response_interval: float = 1.0):
+        self.client = client
+        self.response_interval = response_interval
+        self.pending: Dict[bytes, asyncio.TimerHandle] = {}
+        self._completions = set()
+
+    def request(self, task_token: bytes, order: OrderConfirmation) -> None:
+        # Same odds as notify_delivery_driver: a driver answers after one of
+        # the first 10 intervals two times out of three, and otherwise no one
+        # answers by the end of the 10th interval
+        answer = random.randint(0, 14)
+        available = answer < 10
+        delay = (answer if available else 10) * self.response_interval
+
+        logging.info(f"Asked drivers to deliver order {order.order_number}")
+        self.pending[task_token] = asyncio.get_running_loop().call_later(
+            delay, self._respond, task_token, available
+        )
+
+    def _respond(self, task_token: bytes, available: bool) -> None:
+        del self.pending[task_token]
+        task = asyncio.create_task(self._complete(task_token, available))
+        self._completions.add(task)
+        task.add_done_callback(self._completions.discard)
+
+    async def _complete(self, task_token: bytes, available: bool) -> None:
+        handle = self.client.get_async_activity_handle(task_token=task_token)
+        try:
+            await handle.complete(available)
+        except Exception as e:
+            # The activity may have timed out or the workflow may be gone;
+            # the workflow's retry policy takes care of the former
+            logging.warning(f"Unable to report driver response: {e}")
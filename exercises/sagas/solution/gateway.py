@@ -0,0 +1,111 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+from shared import CreditCardCharge, CreditCardConfirmation
+
+
+class PaymentDeclinedError(Exception):
+    pass
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+class PaymentGatewayClient:
+    """
+    An HTTP client for the payment gateway. One client is shared by every
+    process_credit_card invocation in the worker, so charges reuse pooled
+    keep-alive connections instead of opening a new connection each time.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 100,
+        timeout: float = 5.0,
+        keepalive_timeout: float = 30.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created on first use so that it belongs to the worker's event loop
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=self.keepalive_timeout,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def _on_connection_created(self, session, context, params) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+    async def charge(
+        self, charge: CreditCardCharge, idempotency_key: Optional[str] = None
+    ) -> CreditCardConfirmation:
+        # The gateway answers a repeated idempotency key with the original
+        # charge, which covers a crash between charging and recording it
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+
+        self.requests += 1
+        try:
+            async with self._get_session().post(
+                f"{self.base_url}/charges",
+                json={
+                    "card_holder": charge.credit_card.holderName,
+                    "card_number": charge.credit_card.number,
+                    "amount": charge.bill.amount,
+                    "order_number": charge.bill.order_number,
+                },
+                headers=headers,
+            ) as response:
+                body = await response.json()
+                if response.status == 402:
+                    raise PaymentDeclinedError(body.get("error", "Payment declined"))
+                if response.status != 200:
+                    raise PaymentGatewayError(
+                        f"Payment gateway returned {response.status}"
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise PaymentGatewayError(f"Payment gateway unavailable: {e}") from e
+
+        return CreditCardConfirmation(
+            cardInfo=charge.credit_card,
+            confirmationNumber=body["confirmation_number"],
+            amount=body["amount"],
+            billingTimestamp=body["billing_timestamp"],
+        )
+
+    def reuse_rate(self) -> float:
+        connections = self.connections_created + self.connections_reused
+        return self.connections_reused / connections if connections else 0.0
+
+    def stats(self) -> str:
+        return (
+            f"requests: {self.requests} "
+            f"connections opened: {self.connections_created} "
+            f"reused: {self.connections_reused} "
+            f"reuse rate: {self.reuse_rate():.1%}"
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,124 @@
+import argparse
+import random
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from shared import Address, Distance
+
+# A centroid table is a .npy file holding a structured array with one row per
+# postal code, sorted by code. np.load() memory-maps it, so only the pages
+# touched by lookups are read and every worker process shares them through
+# the page cache.
+CENTROID_DTYPE = np.dtype([("postal_code", "<u4"), ("lat", "<f8"), ("lon", "<f8")])
+
+EARTH_RADIUS_KM = 6371.0
+
+# The pizzeria sits at the centroid of 87101 in downtown Albuquerque
+STORE_LOCATION = (35.0844, -106.6504)
+
+
+def build_centroid_table(
+    path: str, first_code: int = 87000, last_code: int = 88499, seed: int = 0
+) -> int:
+    # Writes a synthetic table for a range of postal codes, scattered around
+    # the store. A real table in the same format can be used instead.
+    rng = np.random.default_rng(seed)
+    codes = np.arange(first_code, last_code + 1, dtype="<u4")
+    table = np.empty(len(codes), dtype=CENTROID_DTYPE)
+    table["postal_code"] = codes
+    table["lat"] = STORE_LOCATION[0] + rng.normal(0, 0.15, len(codes))
+    table["lon"] = STORE_LOCATION[1] + rng.normal(0, 0.15, len(codes))
+    np.save(path, table)
+    return len(table)
+
+
+def parse_postal_codes(addresses: Sequence[Address]) -> np.ndarray:
+    # Only the 5 digit ZIP code is used; anything unparseable becomes 0,
+    # which never matches a row in the table
+    codes = np.zeros(len(addresses), dtype="<u4")
+    for index, address in enumerate(addresses):
+        digits = address.postal_code.strip()[:5]
+        if digits.isdigit():
+            codes[index] = int(digits)
+    return codes
+
+
+def haversine_km(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: float, lon2: float
+) -> np.ndarray:
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class DistanceEngine:
+    """
+    Computes distances from the store for many addresses at once by looking
+    up the centroid of each postal code and calculating great-circle
+    distances for the whole batch with NumPy.
+    """
+
+    def __init__(
+        self, centroids_path: str, origin: Tuple[float, float] = STORE_LOCATION
+    ):
+        self.table = np.load(centroids_path, mmap_mode="r")
+        self.origin = origin
+
+    def lookup(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        table_codes = self.table["postal_code"]
+        rows = np.searchsorted(table_codes, codes)
+        rows = np.minimum(rows, len(table_codes) - 1)
+        found = table_codes[rows] == codes
+        return self.table["lat"][rows], self.table["lon"][rows], found
+
+    def kilometers(self, addresses: Sequence[Address]) -> np.ndarray:
+        lat, lon, found = self.lookup(parse_postal_codes(addresses))
+        kilometers = np.rint(haversine_km(lat, lon, *self.origin)).astype(int)
+        kilometers = np.maximum(kilometers, 1)
+
+        # Fall back to the same estimate get_distance uses for postal codes
+        # that aren't in the table
+        for index in np.flatnonzero(~found):
+            address = addresses[index]
+            estimate = len(address.line1) + len(address.line2) - 10
+            kilometers[index] = estimate if estimate >= 1 else 5
+        return kilometers
+
+    def distances(self, addresses: Sequence[Address]) -> List[Distance]:
+        return [Distance(kilometers=int(km)) for km in self.kilometers(addresses)]
+
+    def locate(self, address: Address) -> Optional[Tuple[float, float]]:
+        lat, lon, found = self.lookup(parse_postal_codes([address]))
+        if not found[0]:
+            return None
+        return float(lat[0]), float(lon[0])
+
+
+def approximate_location(address: Address) -> Tuple[float, float]:
+    # A stable stand-in location for addresses without a known centroid:
+    # the same postal code always lands on the same spot near the store
+    rng = random.Random(address.postal_code)
+    return (
+        STORE_LOCATION[0] + rng.gauss(0, 0.15),
+        STORE_LOCATION[1] + rng.gauss(0, 0.15),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a postal code centroid table")
+    parser.add_argument("path", help="output .npy file")
+    parser.add_argument("--first-code", type=int, default=87000)
+    parser.add_argument("--last-code", type=int, default=88499)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = build_centroid_table(args.path, args.first_code, args.last_code, args.seed)
+    print(f"Wrote {rows} centroids to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Optional, Type, TypeVar
+
+from temporalio import activity
+from temporalio.converter import value_to_type
+
+CheckpointType = TypeVar("CheckpointType")
+
+
+def last_checkpoint(checkpoint_type: Type[CheckpointType]) -> Optional[CheckpointType]:
+    # The details of the last heartbeat a previous attempt sent, if any
+    details = activity.info().heartbeat_details
+    if not details:
+        return None
+    return value_to_type(checkpoint_type, details[0], [])
+
+
+class HeartbeatThrottle:
+    """
+    Heartbeats with the newest checkpoint at most once per `interval`. A
+    checkpoint that arrives too soon is kept and sent once the interval has
+    passed, unless a newer one replaces it first, and whatever is still
+    pending is sent when the throttle is closed, so a retried attempt always
+    resumes from the newest checkpoint that made it out.
+
+    The interval defaults to 80% of the activity's heartbeat timeout, which
+    is how far apart the SDK spaces the heartbeats it sends to the server, so
+    each heartbeat handed to it here goes out rather than being merged. Both
+    outcomes are counted in the worker's metrics: `pizza_heartbeats_sent` and
+    `pizza_heartbeats_throttled`, the checkpoints replaced by a newer one
+    before they could be sent.
+    """
+
+    def __init__(self, interval: Optional[timedelta] = None):
+        if interval is None:
+            timeout = activity.info().heartbeat_timeout
+            interval = timeout * 0.8 if timeout else timedelta(seconds=30)
+        self.interval = interval.total_seconds()
+        self._last_sent: Optional[float] = None
+        self._pending: Optional[Any] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        meter = activity.metric_meter()
+        self._sent = meter.create_counter(
+            "pizza_heartbeats_sent", "Heartbeats sent by activities"
+        )
+        self._throttled = meter.create_counter(
+            "pizza_heartbeats_throttled",
+            "Checkpoints replaced by a newer one before they were sent",
+        )
+
+    def __enter__(self) -> "HeartbeatThrottle":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def send(self, checkpoint: Any) -> None:
+        if self._pending is not None:
+            self._throttled.add(1)
+        self._pending = checkpoint
+
+        now = time.monotonic()
+        if self._last_sent is None or now - self._last_sent >= self.interval:
+            self.flush()
+        elif self._timer is None:
+            # The timer keeps the activity's context, so it can heartbeat
+            self._timer = asyncio.get_running_loop().call_later(
+                self._last_sent + self.interval - now, self.flush
+            )
+
+    def flush(self) -> None:
+        # Sends the pending checkpoint, if any, right away
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is None:
+            return
+        activity.heartbeat(self._pending)
+        self._pending = None
+        self._last_sent = time.monotonic()
+        self._sent.add(1)
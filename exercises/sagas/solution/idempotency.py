@@ -0,0 +1,100 @@
+import asyncio
+import functools
+import sqlite3
+import time
+import typing
+from typing import Any, Optional, Type
+
+from temporalio import activity
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter
+
+
+def idempotency_key(operation: str) -> str:
+    # Every attempt of an activity shares its workflow run and activity ID,
+    # so retries of the same charge or refund always produce the same key,
+    # while a different order (or a second charge in the same order) gets a
+    # new one. Activity IDs start again at "1" in every run, so the run ID
+    # keeps a new run that reuses a workflow ID from getting an old result.
+    info = activity.info()
+    return f"{operation}:{info.workflow_id}:{info.workflow_run_id}:{info.activity_id}"
+
+
+class IdempotencyStore:
+    """
+    Remembers the result of each completed operation by idempotency key in
+    a SQLite database. Every worker on the host can share the database, and
+    it survives restarts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self._lock = asyncio.Lock()
+        self._converter = DataConverter.default.payload_converter
+
+    async def get(self, key: str, result_type: Type) -> Optional[Any]:
+        async with self._lock:
+            row = await asyncio.to_thread(self._get, key)
+        if row is None:
+            return None
+        self.hits += 1
+        return self._converter.from_payload(Payload.FromString(row), result_type)
+
+    async def put(self, key: str, result: Any) -> None:
+        payload = self._converter.to_payload(result).SerializeToString()
+        async with self._lock:
+            await asyncio.to_thread(self._put, key, payload)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._connection.execute(
+            "SELECT payload FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def _put(self, key: str, payload: bytes) -> None:
+        self._connection.execute(
+            "INSERT OR IGNORE INTO results (key, payload, stored_at) VALUES (?, ?, ?)",
+            (key, payload, time.time()),
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def idempotent(fn):
+    """
+    Makes an activity method return the stored result when a previous
+    attempt of the same activity already completed it, instead of running
+    it again. Apply it below @activity.defn; it does nothing unless the
+    activities object has an `idempotency_store`.
+    """
+    result_type = typing.get_type_hints(fn)["return"]
+
+    @functools.wraps(fn)
+    async def wrapper(self, arg):
+        store: Optional[IdempotencyStore] = self.idempotency_store
+        if store is None:
+            return await fn(self, arg)
+
+        key = idempotency_key(fn.__name__)
+        stored = await store.get(key, result_type)
+        if stored is not None:
+            activity.logger.info(f"Returning stored result for {key}")
+            return stored
+
+        result = await fn(self, arg)
+        await store.put(key, result)
+        return result
+
+    return wrapper
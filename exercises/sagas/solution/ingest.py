@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Optional, Set
+
+from corpus import open_corpus, order_from_json
+from loadgen import LoadStats, add_order_options, order_options, start_order
+from shared import OrderOptions
+from temporalio.client import Client
+from temporalio.common import WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+logging.basicConfig(level=logging.INFO)
+
+
+class OffsetTracker:
+    # Starts are acknowledged out of order, so the resumable offset is the
+    # end of the longest run of acknowledged lines from the beginning. Only
+    # offsets ahead of that watermark are remembered, which is never more
+    # than the in-flight window.
+
+    def __init__(self, watermark: int = 0):
+        self.watermark = watermark
+        self._acked: Set[int] = set()
+
+    def ack(self, offset: int) -> None:
+        self._acked.add(offset)
+        while self.watermark in self._acked:
+            self._acked.remove(self.watermark)
+            self.watermark += 1
+
+
+def load_checkpoint(path: Optional[str]) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        return json.load(checkpoint)["offset"]
+
+
+def save_checkpoint(path: Optional[str], offset: int) -> None:
+    if not path:
+        return
+    # Write to a temporary file first so a crash never leaves a torn checkpoint
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as checkpoint:
+        json.dump({"offset": offset}, checkpoint)
+    os.replace(temporary, path)
+
+
+async def ingest(
+    client: Client,
+    source: str,
+    window: int,
+    checkpoint: Optional[str] = None,
+    checkpoint_every: int = 1000,
+    options: Optional[OrderOptions] = None,
+) -> LoadStats:
+    stats = LoadStats()
+    resume_from = load_checkpoint(checkpoint)
+    tracker = OffsetTracker(resume_from)
+    in_flight = asyncio.Semaphore(window)
+    pending = set()
+    failures = []
+
+    if resume_from:
+        logging.info(f"Resuming {source} from offset {resume_from}")
+
+    async def submit(offset: int, line: str):
+        try:
+            order = order_from_json(line)
+            # The workflow ID only depends on the order, and IDs are never
+            # reused, so an order that was started before a crash but not yet
+            # checkpointed is rejected by the server instead of being
+            # submitted twice, whether it is still running or has completed.
+            # (Completed workflows are only remembered for the namespace's
+            # retention period.)
+            await start_order(
+                client,
+                order,
+                options,
+                id_reuse_policy=WorkflowIDReusePolicy.REJECT_DUPLICATE,
+            )
+            stats.record_start()
+        except WorkflowAlreadyStartedError:
+            logging.info(f"Order at offset {offset} was already started")
+        except Exception as e:
+            failures.append(e)
+            return
+        finally:
+            in_flight.release()
+
+        previous = tracker.watermark
+        tracker.ack(offset)
+        if tracker.watermark // checkpoint_every > previous // checkpoint_every:
+            save_checkpoint(checkpoint, tracker.watermark)
+
+    lines = open_corpus(source, "r")
+    try:
+        offset = 0
+        while not failures:
+            line = await asyncio.to_thread(lines.readline)
+            if not line:
+                break
+            if offset >= resume_from and line.strip():
+                await in_flight.acquire()
+                task = asyncio.create_task(submit(offset, line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            elif offset >= resume_from:
+                tracker.ack(offset)
+            offset += 1
+
+        await asyncio.gather(*pending)
+    finally:
+        save_checkpoint(checkpoint, tracker.watermark)
+        if source != "-":
+            lines.close()
+
+    if failures:
+        raise RuntimeError(
+            f"Ingest stopped at offset {tracker.watermark}"
+        ) from failures[0]
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Stream orders from a corpus file or stdin into workflows"
+    )
+    parser.add_argument("source", help="corpus file to read, or - for stdin")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=100,
+        help="maximum number of workflow starts in flight",
+    )
+    parser.add_argument(
+        "--checkpoint", help="file recording the last acknowledged offset"
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=1000,
+        help="save the checkpoint every N acknowledged orders",
+    )
+    add_order_options(parser)
+    args = parser.parse_args()
+
+    client = await Client.connect("localhost:7233", namespace="default")
+
+    stats = await ingest(
+        client,
+        args.source,
+        args.window,
+        args.checkpoint,
+        args.checkpoint_every,
+        order_options(args),
+    )
+    logging.info(
+        f"Ingest complete: started {stats.started} orders "
+        f"at {stats.start_rate():.2f}/s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from batching import MicroBatcher
+from shared import Pizza, PizzaOrder
+from temporalio import activity
+
+# Ingredients the store hasn't seen before start with this many portions
+DEFAULT_STOCK = 1_000_000
+
+# A deduction is either final ("committed") or a hold on the ingredients
+# ("held") that is put back when it expires unless it is committed first.
+# Reverted and expired deductions no longer count against the stock.
+HELD = "held"
+COMMITTED = "committed"
+REVERTED = "reverted"
+EXPIRED = "expired"
+
+
+def deduction_key(order_number: str) -> str:
+    # Every attempt of the inventory activities for an order shares the
+    # workflow run, so retries find the deduction their first attempt made,
+    # while a new run that reuses the order number (or the workflow ID)
+    # deducts the ingredients again.
+    info = activity.info()
+    return f"{info.workflow_id}:{info.workflow_run_id}:{order_number}"
+
+
+def pizza_ingredients(pizza: Pizza) -> Counter:
+    # Every pizza takes one portion of dough for its size plus cheese; each
+    # topping named in the description ("Large, with mushrooms and onions")
+    # takes one portion of that topping
+    size, _, toppings = pizza.description.partition(", with ")
+    ingredients = Counter({f"{size.strip().lower()} dough": 1, "cheese": 1})
+    for topping in toppings.split(" and ") if toppings else []:
+        topping = topping.strip().lower()
+        if topping == "extra cheese":
+            topping = "cheese"
+        ingredients[topping] += 1
+    return ingredients
+
+
+def order_ingredients(order: PizzaOrder) -> Dict[str, int]:
+    ingredients = Counter()
+    for pizza in order.items:
+        ingredients.update(pizza_ingredients(pizza))
+    return dict(ingredients)
+
+
+@dataclass
+class InventoryShortage:
+    order_number: str
+    ingredient: str
+    requested: int
+    available: int
+
+
+class InventoryConflictError(Exception):
+    pass
+
+
+class InventoryStore:
+    """
+    Per-ingredient stock counts in a SQLite database in WAL mode, which any
+    number of worker processes on the host can share.
+
+    Updates are optimistic: stock is read without holding a lock, and the
+    write only succeeds if no other process changed the same ingredients in
+    the meantime (checked with a version number per ingredient); otherwise
+    it is retried with fresh counts. Concurrent orders in one process are
+    collected by a MicroBatcher and deducted in a single transaction, so
+    they contend for the database once per batch rather than once per
+    order. Each deduction is recorded by a key, such as the one
+    deduction_key() returns, which makes updates, reservations, commits and
+    reverts all safe to repeat.
+
+    A reservation holds the ingredients until it is committed or expires;
+    `sweep()` returns expired holds to the stock in the background, so an
+    order that fails before committing needs no revert.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_batch_size: int = 100,
+        max_wait: float = 0.005,
+        max_conflict_retries: int = 50,
+        initial_stock: int = DEFAULT_STOCK,
+        hold: float = 300,
+    ):
+        self.path = path
+        self.hold = hold
+        self.initial_stock = initial_stock
+        self.max_conflict_retries = max_conflict_retries
+        self.conflicts = 0
+        self.shortages = 0
+        self.expired = 0
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS stock ("
+            " ingredient TEXT PRIMARY KEY,"
+            " quantity INTEGER NOT NULL,"
+            " version INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS deductions ("
+            " key TEXT PRIMARY KEY,"
+            " order_number TEXT NOT NULL,"
+            " ingredients TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " expires_at REAL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS holds ON deductions (state, expires_at)"
+        )
+        self._lock = asyncio.Lock()
+        self._batcher = MicroBatcher(
+            self._update_batch, max_batch_size=max_batch_size, max_wait=max_wait
+        )
+
+    async def update(self, order: PizzaOrder, key: str) -> Optional[InventoryShortage]:
+        # Returns the first ingredient that ran out, if any; nothing is
+        # deducted for an order that can't be filled
+        return await self._batcher.submit((order, key, None))
+
+    async def reserve(
+        self, order: PizzaOrder, key: str, hold: Optional[float] = None
+    ) -> Optional[InventoryShortage]:
+        # Like update(), but the ingredients go back to the stock after
+        # `hold` seconds unless the reservation is committed
+        hold = self.hold if hold is None else hold
+        return await self._batcher.submit((order, key, time.time() + hold))
+
+    async def commit(self, key: str) -> bool:
+        # Returns False if there is no live reservation or deduction for the
+        # key, e.g. because the hold already expired
+        async with self._lock:
+            return await asyncio.to_thread(self._commit, key)
+
+    async def revert(self, key: str) -> bool:
+        # Returns whether anything was put back. Reverting a key that was
+        # never deducted, or was already reverted or expired, changes nothing.
+        async with self._lock:
+            return await asyncio.to_thread(self._revert, key)
+
+    async def sweep(self, interval: float = 1.0) -> None:
+        # Runs until cancelled; any number of workers can sweep the same
+        # database
+        while True:
+            await asyncio.sleep(interval)
+            async with self._lock:
+                self.expired += await asyncio.to_thread(self._expire_holds)
+
+    def stock(self) -> Dict[str, int]:
+        rows = self._connection.execute("SELECT ingredient, quantity FROM stock")
+        return dict(rows.fetchall())
+
+    def stats(self) -> str:
+        return (
+            f"{self._batcher.stats()} conflicts: {self.conflicts}"
+            f" shortages: {self.shortages} expired holds: {self.expired}"
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    async def _update_batch(
+        self, requests: List[Tuple[PizzaOrder, str, Optional[float]]]
+    ) -> List[Optional[InventoryShortage]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._deduct, requests)
+
+    def _deduct(
+        self, requests: List[Tuple[PizzaOrder, str, Optional[float]]]
+    ) -> List[Optional[InventoryShortage]]:
+        needed = [order_ingredients(order) for order, _, _ in requests]
+        names = sorted({name for ingredients in needed for name in ingredients})
+
+        for _ in range(self.max_conflict_retries):
+            self._add_missing(names)
+            stock = self._read_stock(names)
+            already = self._deducted([key for _, key, _ in requests])
+
+            # Fill orders in the order they arrived until an ingredient runs out
+            available = {name: quantity for name, (quantity, _) in stock.items()}
+            results: List[Optional[InventoryShortage]] = []
+            accepted = []
+            for (order, key, expires_at), ingredients in zip(requests, needed):
+                if key in already:
+                    results.append(None)
+                    continue
+                shortage = self._shortage(order, ingredients, available)
+                results.append(shortage)
+                if shortage is None:
+                    for name, count in ingredients.items():
+                        available[name] -= count
+                    accepted.append((key, order.order_number, ingredients, expires_at))
+                    # A retried update can share a batch with its first attempt
+                    already.add(key)
+
+            if not accepted:
+                break
+            if self._write(stock, available, accepted):
+                break
+            self.conflicts += 1
+        else:
+            raise InventoryConflictError(
+                f"Stock kept changing after {self.max_conflict_retries} attempts"
+            )
+
+        self.shortages += sum(result is not None for result in results)
+        return results
+
+    @staticmethod
+    def _shortage(
+        order: PizzaOrder, ingredients: Dict[str, int], available: Dict[str, int]
+    ) -> Optional[InventoryShortage]:
+        for name, count in ingredients.items():
+            if available[name] < count:
+                return InventoryShortage(
+                    order_number=order.order_number,
+                    ingredient=name,
+                    requested=count,
+                    available=available[name],
+                )
+        return None
+
+    def _write(self, stock, available, accepted) -> bool:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for name, (quantity, version) in stock.items():
+                if available[name] == quantity:
+                    continue
+                cursor = connection.execute(
+                    "UPDATE stock SET quantity = ?, version = version + 1"
+                    " WHERE ingredient = ? AND version = ?",
+                    (available[name], name, version),
+                )
+                if cursor.rowcount == 0:
+                    connection.execute("ROLLBACK")
+                    return False
+
+            now = time.time()
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO deductions"
+                " (key, order_number, ingredients, state, expires_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        key,
+                        order_number,
+                        json.dumps(ingredients),
+                        COMMITTED if expires_at is None else HELD,
+                        expires_at,
+                        now,
+                    )
+                    for key, order_number, ingredients, expires_at in accepted
+                ],
+            )
+            if cursor.rowcount != len(accepted):
+                # Another process deducted one of these orders first
+                connection.execute("ROLLBACK")
+                return False
+            connection.execute("COMMIT")
+            return True
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _commit(self, key: str) -> bool:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            connection.execute(
+                "UPDATE deductions SET state = ?, expires_at = NULL, updated_at = ?"
+                " WHERE key = ? AND state = ? AND expires_at > ?",
+                (COMMITTED, now, key, HELD, now),
+            )
+            row = connection.execute(
+                "SELECT state FROM deductions WHERE key = ?", (key,)
+            ).fetchone()
+            connection.execute("COMMIT")
+            return row is not None and row[0] == COMMITTED
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _revert(self, key: str) -> bool:
+        return (
+            self._put_back(
+                "key = ? AND state IN (?, ?)",
+                (key, HELD, COMMITTED),
+                REVERTED,
+            )
+            > 0
+        )
+
+    def _expire_holds(self) -> int:
+        return self._put_back(
+            "state = ? AND expires_at <= ?", (HELD, time.time()), EXPIRED
+        )
+
+    def _put_back(self, condition: str, parameters, state: str) -> int:
+        # Returns the ingredients of every matching deduction to the stock
+        # and moves the deductions to `state`, in one transaction
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                f"SELECT key, ingredients FROM deductions WHERE {condition}",
+                parameters,
+            ).fetchall()
+            returned = Counter()
+            for _, ingredients in rows:
+                returned.update(json.loads(ingredients))
+
+            connection.executemany(
+                "UPDATE stock SET quantity = quantity + ?, version = version + 1"
+                " WHERE ingredient = ?",
+                [(count, name) for name, count in returned.items()],
+            )
+            connection.executemany(
+                "UPDATE deductions SET state = ?, expires_at = NULL, updated_at = ?"
+                " WHERE key = ?",
+                [(state, time.time(), key) for key, _ in rows],
+            )
+            connection.execute("COMMIT")
+            return len(rows)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _add_missing(self, names: List[str]) -> None:
+        # New ingredients start with the default stock
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO stock (ingredient, quantity, version) VALUES (?, ?, 0)",
+            [(name, self.initial_stock) for name in names],
+        )
+
+    def _read_stock(self, names: List[str]):
+        placeholders = ",".join("?" * len(names))
+        rows = self._connection.execute(
+            f"SELECT ingredient, quantity, version FROM stock"
+            f" WHERE ingredient IN ({placeholders})",
+            names,
+        )
+        return {name: (quantity, version) for name, quantity, version in rows}
+
+    def _deducted(self, keys: List[str]):
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection.execute(
+            f"SELECT key FROM deductions WHERE key IN ({placeholders})", keys
+        )
+        return {key for (key,) in rows}
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+
+
+def offset_port(address: str, offset: int) -> str:
+    host, _, port = address.rpartition(":")
+    return f"{host}:{int(port) + offset}"
+
+
+def args_for_process(worker_args: List[str], index: int) -> List[str]:
+    # Only one process can bind each port, so the Prometheus endpoint of the
+    # process at `index` is on the --metrics-address port plus `index`
+    args = list(worker_args)
+    for position, arg in enumerate(args):
+        if arg == "--metrics-address" and position + 1 < len(args):
+            args[position + 1] = offset_port(args[position + 1], index)
+        elif arg.startswith("--metrics-address="):
+            address = arg.split("=", 1)[1]
+            args[position] = f"--metrics-address={offset_port(address, index)}"
+    return args
+
+
+class WorkerProcess:
+    """
+    Runs one worker.py process and starts it again whenever it exits,
+    waiting longer after each crash that comes soon after the last start.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        worker_args: List[str],
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        shutdown_timeout: float = 10.0,
+    ):
+        self.index = index
+        self.worker_args = worker_args
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.restarts = 0
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        delay = self.restart_delay
+        while not self._stopping.is_set():
+            began = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                WORKER,
+                *self.worker_args,
+                # Ctrl-C reaches the launcher only, which stops the workers
+                start_new_session=True,
+            )
+            logging.info(f"Worker {self.index} started, pid {self.process.pid}")
+            if self._stopping.is_set():
+                # stop() was called while the process was starting
+                self.process.send_signal(signal.SIGINT)
+            code = await self.process.wait()
+            if self._stopping.is_set():
+                break
+
+            # A worker that ran for a while gets restarted right away again
+            if time.monotonic() - began > 60:
+                delay = self.restart_delay
+            logging.warning(
+                f"Worker {self.index} exited with {code}, restarting in {delay:.0f}s"
+            )
+            self.restarts += 1
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+
+        # SIGINT lets the worker finish its shutdown, as it would on Ctrl-C
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Worker {self.index} didn't stop in time, killing it")
+            process.kill()
+            await process.wait()
+
+
+class WorkerLauncher:
+    """
+    Starts `processes` workers polling the same task queue with the same
+    worker.py arguments, so one host can use all of its cores, and keeps
+    them running until stop() is called. Each process serves its metrics on
+    its own port, counting up from the one given with --metrics-address.
+    """
+
+    def __init__(self, processes: int, worker_args: List[str], **process_options):
+        self.workers = [
+            WorkerProcess(
+                index, args_for_process(worker_args, index), **process_options
+            )
+            for index in range(processes)
+        ]
+
+    async def run(self) -> None:
+        await asyncio.gather(*(worker.run() for worker in self.workers))
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+
+    @property
+    def restarts(self) -> int:
+        return sum(worker.restarts for worker in self.workers)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Run several pizza order workers",
+        epilog="Arguments after -- are passed to every worker.py process, "
+        "e.g. launcher.py --processes 4 -- --inventory-db inventory.db. "
+        "With --metrics-address 0.0.0.0:9000, the processes serve their "
+        "metrics on ports 9000, 9001 and so on.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes to run",
+    )
+    parser.add_argument("worker_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    worker_args = args.worker_args
+    if worker_args[:1] == ["--"]:
+        worker_args = worker_args[1:]
+
+    logging.basicConfig(level=logging.INFO)
+    launcher = WorkerLauncher(args.processes, worker_args)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, lambda: asyncio.ensure_future(launcher.stop()))
+
+    await launcher.run()
+    logging.info(f"All workers stopped after {launcher.restarts} restarts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
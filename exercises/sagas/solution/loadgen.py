@@ -0,0 +1,161 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from shared import TASK_QUEUE_NAME, OrderOptions, PizzaOrder
+from temporalio.client import Client, WorkflowHandle
+from temporalio.common import WorkflowIDReusePolicy
+from workflow import PizzaOrderWorkflow
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    # Nearest-rank percentile; good enough for reporting load test results
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class LoadStats:
+    started: int = 0
+    start_failures: int = 0
+    completed: int = 0
+    failed: int = 0
+    latencies: List[float] = field(default_factory=list)
+    lags: List[float] = field(default_factory=list)
+    began_at: float = field(default_factory=time.monotonic)
+    first_start: Optional[float] = None
+    last_start: Optional[float] = None
+    last_completion: Optional[float] = None
+
+    def record_start(self) -> None:
+        now = time.monotonic()
+        if self.first_start is None:
+            self.first_start = now
+        self.last_start = now
+        self.started += 1
+
+    def record_start_failure(self) -> None:
+        self.start_failures += 1
+
+    def record_lag(self, lag: float) -> None:
+        self.lags.append(lag)
+
+    def record_completion(self, latency: float, failed: bool = False) -> None:
+        self.last_completion = time.monotonic()
+        self.latencies.append(latency)
+        self.completed += 1
+        if failed:
+            self.failed += 1
+
+    def start_rate(self) -> float:
+        if self.first_start is None:
+            return 0.0
+        elapsed = self.last_start - self.began_at
+        return self.started / elapsed if elapsed > 0 else float(self.started)
+
+    def completion_rate(self) -> float:
+        if self.last_completion is None:
+            return 0.0
+        elapsed = self.last_completion - self.began_at
+        return self.completed / elapsed if elapsed > 0 else float(self.completed)
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.began_at
+        report = (
+            f"Orders started: {self.started} completed: {self.completed} "
+            f"failed: {self.failed} start failures: {self.start_failures} "
+            f"in {elapsed:.2f}s\n"
+            f"Start rate: {self.start_rate():.2f}/s "
+            f"completion rate: {self.completion_rate():.2f}/s\n"
+            f"Latency p50: {percentile(self.latencies, 50):.3f}s "
+            f"p95: {percentile(self.latencies, 95):.3f}s "
+            f"p99: {percentile(self.latencies, 99):.3f}s"
+        )
+        if self.lags:
+            report += (
+                f"\nStart lag p50: {percentile(self.lags, 50):.3f}s "
+                f"p95: {percentile(self.lags, 95):.3f}s "
+                f"p99: {percentile(self.lags, 99):.3f}s "
+                f"max: {max(self.lags):.3f}s"
+            )
+        return report
+
+
+# The cheap steps the workflow knows how to start as local activities
+LOCAL_ACTIVITIES = ["get_distance", "update_inventory", "send_bill"]
+
+
+def local_activity_names(names: str) -> List[str]:
+    selected = [name for name in names.split(",") if name]
+    unsupported = [name for name in selected if name not in LOCAL_ACTIVITIES]
+    if unsupported:
+        raise argparse.ArgumentTypeError(
+            f"can't run {', '.join(unsupported)} as local activities, "
+            f"choose from {', '.join(LOCAL_ACTIVITIES)}"
+        )
+    return selected
+
+
+def add_order_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--parallel-steps",
+        action="store_true",
+        help="run independent workflow steps concurrently",
+    )
+    parser.add_argument(
+        "--local-activities",
+        type=local_activity_names,
+        default=[],
+        help="comma-separated activities to run as local activities",
+    )
+    parser.add_argument(
+        "--async-driver-notification",
+        action="store_true",
+        help="complete driver notifications asynchronously",
+    )
+    parser.add_argument(
+        "--dispatch-drivers",
+        action="store_true",
+        help="assign the nearest free driver with the dispatch engine",
+    )
+    parser.add_argument(
+        "--reserve-inventory",
+        action="store_true",
+        help="hold ingredients until the card is charged instead of reverting",
+    )
+    parser.add_argument(
+        "--fraud-check",
+        action="store_true",
+        help="score each order for fraud before charging the card",
+    )
+
+
+def order_options(args: argparse.Namespace) -> OrderOptions:
+    return OrderOptions(
+        parallel_steps=args.parallel_steps,
+        local_activities=args.local_activities,
+        async_driver_notification=args.async_driver_notification,
+        dispatch_drivers=args.dispatch_drivers,
+        reserve_inventory=args.reserve_inventory,
+        fraud_check=args.fraud_check,
+    )
+
+
+async def start_order(
+    client: Client,
+    order: PizzaOrder,
+    options: Optional[OrderOptions] = None,
+    id_reuse_policy: WorkflowIDReusePolicy = WorkflowIDReusePolicy.ALLOW_DUPLICATE,
+) -> WorkflowHandle:
+    return await client.start_workflow(
+        PizzaOrderWorkflow.order_pizza,
+        args=[order, options or OrderOptions()],
+        id=f"pizza-workflow-order-{order.order_number}",
+        task_queue=TASK_QUEUE_NAME,
+        id_reuse_policy=id_reuse_policy,
+    )
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Iterator, List, Optional
+
+from collector import ResultCollector, is_failure
+from corpus import order_source
+from loadgen import LoadStats, add_order_options, order_options, start_order
+from shared import OrderOptions, PizzaOrder
+from temporalio.client import Client
+
+logging.basicConfig(level=logging.INFO)
+
+
+def poisson_schedule(
+    rate: float, count: Optional[int], duration: Optional[float], seed: int
+) -> Iterator[float]:
+    # Exponentially distributed gaps between arrivals give a Poisson process
+    # with `rate` orders per second. The offsets are seconds from the start.
+    rng = random.Random(seed)
+    offset = 0.0
+    index = 0
+    while count is None or index < count:
+        offset += rng.expovariate(rate)
+        if duration is not None and offset > duration:
+            return
+        yield offset
+        index += 1
+
+
+def read_trace(path: str) -> Iterator[float]:
+    # A trace file has one arrival offset (in seconds) per line
+    with open(path) as trace:
+        for line in trace:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield float(line)
+
+
+def write_trace(path: str, schedule: List[float]) -> None:
+    with open(path, "w") as trace:
+        for offset in schedule:
+            trace.write(f"{offset:.6f}\n")
+
+
+async def drive(
+    client: Client,
+    schedule: Iterator[float],
+    orders: Iterator[PizzaOrder],
+    collector: ResultCollector,
+    options: Optional[OrderOptions] = None,
+) -> LoadStats:
+    # Orders are started when the schedule says so, no matter how many are
+    # still in flight, so queueing delay shows up as start lag and latency
+    # instead of silently lowering the arrival rate.
+    stats = LoadStats()
+    run_id = int(time.time())
+    pending = set()
+
+    async def run_order(index: int, order: PizzaOrder, scheduled: float):
+        order.order_number = f"{order.order_number}-{run_id}-{index}"
+
+        try:
+            handle = await start_order(client, order, options)
+        except Exception as e:
+            # Counted like in the closed-loop starter, without ending the run
+            logging.warning(f"Unable to start order {order.order_number}: {e}")
+            stats.record_start_failure()
+            return
+        stats.record_start()
+        stats.record_lag(time.monotonic() - scheduled)
+
+        outcome = await collector.collect(handle, scheduled)
+        stats.record_completion(time.monotonic() - scheduled, is_failure(outcome))
+
+    for index, (offset, order) in enumerate(zip(schedule, orders)):
+        scheduled = stats.began_at + offset
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        task = asyncio.create_task(run_order(index, order, scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    await asyncio.gather(*pending)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Start pizza order workflows at a target arrival rate"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="mean arrivals per second"
+    )
+    parser.add_argument("--orders", type=int, help="number of orders to start")
+    parser.add_argument(
+        "--duration", type=float, help="stop scheduling arrivals after N seconds"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for the Poisson arrivals"
+    )
+    parser.add_argument("--trace", help="replay arrival offsets from this file instead")
+    parser.add_argument("--corpus", help="replay orders from a corpus file")
+    parser.add_argument(
+        "--results", help="append each order's result to this file as JSON Lines"
+    )
+    parser.add_argument(
+        "--record-trace", help="write the arrival offsets used to this file"
+    )
+    add_order_options(parser)
+    args = parser.parse_args()
+
+    if args.trace:
+        schedule = read_trace(args.trace)
+    else:
+        if args.orders is None and args.duration is None:
+            parser.error("one of --orders, --duration or --trace is required")
+        schedule = poisson_schedule(args.rate, args.orders, args.duration, args.seed)
+
+    if args.record_trace:
+        schedule = list(schedule)
+        write_trace(args.record_trace, schedule)
+
+    client = await Client.connect("localhost:7233", namespace="default")
+
+    sink = open(args.results, "a") if args.results else None
+    collector = ResultCollector(sink)
+    try:
+        stats = await drive(
+            client,
+            schedule,
+            order_source(args.corpus),
+            collector,
+            order_options(args),
+        )
+    finally:
+        if sink:
+            sink.close()
+    logging.info(f"Open-loop run complete:\n{stats.report()}\n{collector.summary()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, ApplicationError
+
+ParamType = TypeVar("ParamType")
+
+
+@dataclass(eq=False)
+class Compensation:
+    activity: Callable[..., Awaitable[Any]]
+    arg: Any
+    start_to_close_timeout: timedelta
+    retry_policy: Optional[RetryPolicy] = None
+    # Compensations that have to complete before this one may start
+    after: List["Compensation"] = field(default_factory=list)
+
+
+class Saga:
+    """
+    Keeps track of the compensating Activities for the steps a Workflow has
+    performed so far. When the Workflow needs to roll back, compensations
+    without a dependency between them run concurrently, and each one is
+    retried on its own according to its retry policy. A compensation only
+    waits for the ones it was explicitly ordered after.
+    """
+
+    def __init__(
+        self,
+        start_to_close_timeout: timedelta = timedelta(seconds=5),
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.start_to_close_timeout = start_to_close_timeout
+        self.retry_policy = retry_policy
+        self.compensations: List[Compensation] = []
+
+    def add_compensation(
+        self,
+        activity: Callable[[Any, ParamType], Awaitable[Any]],
+        arg: ParamType,
+        *,
+        after: Sequence[Compensation] = (),
+        before: Sequence[Compensation] = (),
+        start_to_close_timeout: Optional[timedelta] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> Compensation:
+        for other in [*after, *before]:
+            # compensate() only tracks the compensations it is about to run
+            if not any(other is existing for existing in self.compensations):
+                raise ValueError(
+                    f"Compensation {other.activity.__name__} can't be ordered"
+                    " against, it isn't waiting to run in this Saga"
+                )
+        compensation = Compensation(
+            activity=activity,
+            arg=arg,
+            start_to_close_timeout=start_to_close_timeout
+            or self.start_to_close_timeout,
+            retry_policy=retry_policy or self.retry_policy,
+            after=list(after),
+        )
+        for other in before:
+            other.after.append(compensation)
+        self.compensations.append(compensation)
+        return compensation
+
+    async def compensate(self, error: Optional[BaseException] = None) -> None:
+        """
+        Runs every compensation registered so far. If any of them fails, a
+        CompensationError is raised, caused by `error`, the failure that
+        made the Workflow roll back, so the Workflow still reports it.
+        """
+        self._check_for_cycles()
+
+        done = {id(c): asyncio.Event() for c in self.compensations}
+        failed = set()
+        failures = []
+
+        async def run(compensation: Compensation):
+            try:
+                for dependency in compensation.after:
+                    await done[id(dependency)].wait()
+                    if id(dependency) in failed:
+                        # Running this one could be unsafe when what it
+                        # depends on was never undone
+                        failed.add(id(compensation))
+                        return
+
+                await workflow.execute_activity_method(
+                    compensation.activity,
+                    compensation.arg,
+                    start_to_close_timeout=compensation.start_to_close_timeout,
+                    retry_policy=compensation.retry_policy,
+                )
+            except ActivityError as e:
+                workflow.logger.error(
+                    f"Compensation {compensation.activity.__name__} failed: {e.message}"
+                )
+                failed.add(id(compensation))
+                failures.append(e)
+            finally:
+                done[id(compensation)].set()
+
+        await asyncio.gather(*(run(c) for c in self.compensations))
+        self.compensations = []
+
+        if failed:
+            raise ApplicationError(
+                f"{len(failed)} compensation(s) did not complete",
+                *(failure.message for failure in failures),
+                type="CompensationError",
+            ) from error
+
+    def _check_for_cycles(self) -> None:
+        visiting, visited = set(), set()
+
+        def visit(compensation: Compensation):
+            if id(compensation) in visited:
+                return
+            if id(compensation) in visiting:
+                raise ValueError("Compensations have a circular dependency")
+            visiting.add(id(compensation))
+            for dependency in compensation.after:
+                visit(dependency)
+            visiting.discard(id(compensation))
+            visited.add(id(compensation))
+
+        for compensation in self.compensations:
+            visit(compensation)
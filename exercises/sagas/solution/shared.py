@@ -1,7 +1,10 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 TASK_QUEUE_NAME = "pizza-tasks"
+# notify_delivery_driver can hold its slot for minutes, so it has a queue of
+# its own where it can't keep the fast activities waiting
+DRIVER_TASK_QUEUE_NAME = "pizza-driver-tasks"
 
 
 @dataclass
@@ -79,6 +82,98 @@ class CreditCardConfirmation:
     billingTimestamp: int
 
 
+@dataclass
+class DispatchRequest:
+    order_number: str
+    address: Address
+
+
+@dataclass
+class DriverAssignment:
+    order_number: str
+    # None when no driver is free
+    driver_id: Optional[str]
+    kilometers: float
+
+
+@dataclass
+class FraudCheck:
+    # Only what fraud scoring needs, so it is cheap to send to another process
+    order_number: str
+    amount: int
+    card_number: str
+    postal_code: str
+    items: int
+
+
+@dataclass
+class FraudScore:
+    order_number: str
+    score: float
+
+
+@dataclass
+class DeliveryCheckpoint:
+    # Progress of notify_delivery_driver, sent as its heartbeat details
+    iteration: int
+    success_simulation: int
+
+
+@dataclass
+class OrderOptions:
+    # Start steps that don't depend on each other's results at the same time
+    parallel_steps: bool = False
+    # Names of cheap activities to run as local activities, for example
+    # ["get_distance"]. Activities that heartbeat can't run locally.
+    local_activities: List[str] = field(default_factory=list)
+    # Notify the driver with an activity that is completed asynchronously by
+    # the driver service instead of one that heartbeats while it waits
+    async_driver_notification: bool = False
+    # Assign the nearest free driver with the dispatch engine instead
+    dispatch_drivers: bool = False
+    # Hold ingredients with reserve_inventory and commit them once the card
+    # is charged; a failed order lets the hold expire instead of reverting,
+    # and a declined card, which was never charged, isn't refunded
+    reserve_inventory: bool = False
+    # Score the order for fraud before charging the card
+    fraud_check: bool = False
+
+
+@dataclass
+class OrderPage:
+    # Where to read the next orders from a corpus file. `position` is the
+    # file position returned by the previous page, 0 for the start.
+    corpus_path: str
+    position: int
+    count: int
+
+
+@dataclass
+class OrderPageResult:
+    orders: List[PizzaOrder]
+    next_position: int
+
+
+@dataclass
+class BatchSummary:
+    processed: int = 0
+    outcomes: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class BatchInput:
+    # Either the orders themselves or a corpus file to read them from
+    orders: List[PizzaOrder] = field(default_factory=list)
+    corpus_path: Optional[str] = None
+    position: int = 0
+    max_concurrent_orders: int = 100
+    page_size: int = 500
+    orders_per_run: int = 5000
+    options: Optional[OrderOptions] = None
+    # Carried over when the batch continues as new
+    summary: Optional[BatchSummary] = None
+
+
 def create_pizza_order() -> PizzaOrder:
     credit_card_info = CreditCardInfo(
         holderName="Lisa Anderson", number="424242424242424"
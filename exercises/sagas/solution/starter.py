@@ -1,23 +1,142 @@
+import argparse
 import asyncio
+import itertools
 import logging
+import os
+import time
+from typing import Optional
 
-from shared import TASK_QUEUE_NAME, create_pizza_order
+from batch_workflow import PizzaBatchWorkflow
+from collector import ResultCollector, is_failure
+from corpus import order_source
+from loadgen import LoadStats, add_order_options, order_options, start_order
+from shared import TASK_QUEUE_NAME, BatchInput, OrderOptions, create_pizza_order
 from temporalio.client import Client
+from temporalio.contrib.opentelemetry import TracingInterceptor
+from tracing import init_tracing
 from workflow import PizzaOrderWorkflow
 
 logging.basicConfig(level=logging.INFO)
 
 
+async def run_load(
+    client: Client,
+    count: int,
+    concurrency: int,
+    corpus: Optional[str] = None,
+    collector: Optional[ResultCollector] = None,
+    options: Optional[OrderOptions] = None,
+) -> LoadStats:
+    # Each runner starts an order and waits for its result before taking the
+    # next one, so at most `concurrency` orders are in flight at any time
+    stats = LoadStats()
+    collector = collector or ResultCollector()
+    run_id = int(time.time())
+    next_order = enumerate(itertools.islice(order_source(corpus), count))
+
+    async def runner():
+        for index, order in next_order:
+            order.order_number = f"{order.order_number}-{run_id}-{index}"
+
+            began = time.monotonic()
+            try:
+                handle = await start_order(client, order, options)
+            except Exception as e:
+                # An order that can't be started, e.g. because its workflow
+                # ID is taken, is counted rather than ending the whole run
+                logging.warning(f"Unable to start order {order.order_number}: {e}")
+                stats.record_start_failure()
+                continue
+            stats.record_start()
+
+            outcome = await collector.collect(handle, began)
+            stats.record_completion(time.monotonic() - began, is_failure(outcome))
+
+    await asyncio.gather(*(runner() for _ in range(min(concurrency, count))))
+    return stats
+
+
 async def main():
+    parser = argparse.ArgumentParser(description="Start pizza order workflows")
+    parser.add_argument(
+        "--orders",
+        type=int,
+        default=0,
+        help="number of orders to start in load-generation mode",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="maximum number of orders in flight in load-generation mode",
+    )
+    parser.add_argument(
+        "--corpus", help="replay orders from a corpus file in load-generation mode"
+    )
+    parser.add_argument(
+        "--results", help="append each order's result to this file as JSON Lines"
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="CORPUS",
+        help="run every order in a corpus file through one batch workflow",
+    )
+    parser.add_argument(
+        "--trace-file",
+        help="append OpenTelemetry spans for the started orders to this file",
+    )
+    add_order_options(parser)
+    args = parser.parse_args()
+    options = order_options(args)
+
+    interceptors = []
+    if args.trace_file:
+        init_tracing("pizza-starter", args.trace_file)
+        interceptors.append(TracingInterceptor())
+
     # Create client connected to server at the given address
-    client = await Client.connect("localhost:7233", namespace="default")
+    client = await Client.connect(
+        "localhost:7233", namespace="default", interceptors=interceptors
+    )
+
+    if args.batch:
+        summary = await client.execute_workflow(
+            PizzaBatchWorkflow.run,
+            BatchInput(
+                corpus_path=os.path.abspath(args.batch),
+                max_concurrent_orders=args.concurrency,
+                options=options,
+            ),
+            id=f"pizza-batch-{int(time.time())}",
+            task_queue=TASK_QUEUE_NAME,
+        )
+        logging.info(f"Batch complete:\n{summary}")
+        return
+
+    if args.orders > 0:
+        sink = open(args.results, "a") if args.results else None
+        collector = ResultCollector(sink)
+        try:
+            stats = await run_load(
+                client,
+                args.orders,
+                args.concurrency,
+                args.corpus,
+                collector,
+                options,
+            )
+        finally:
+            if sink:
+                sink.close()
+        logging.info(f"Load run complete:\n{stats.report()}\n{collector.summary()}")
+        return
 
     order = create_pizza_order()
 
     # Execute a workflow
     handle = await client.start_workflow(
         PizzaOrderWorkflow.order_pizza,
-        order,
+        args=[order, options],
         id=f"pizza-workflow-order-{order.order_number}",
         task_queue=TASK_QUEUE_NAME,
     )
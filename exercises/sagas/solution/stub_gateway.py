@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import itertools
+from time import time
+
+from aiohttp import web
+
+# A local stand-in for the payment gateway used by process_credit_card. Like
+# the original inline check, it accepts 16 digit card numbers and declines
+# everything else.
+
+
+def create_app(latency: float = 0.005) -> web.Application:
+    confirmation_numbers = itertools.count(78759)
+    charges_by_key = {}
+
+    async def charge(request: web.Request) -> web.Response:
+        body = await request.json()
+        key = request.headers.get("Idempotency-Key")
+        if key in charges_by_key:
+            return web.json_response(charges_by_key[key])
+
+        await asyncio.sleep(latency)
+
+        if len(body["card_number"]) != 16:
+            return web.json_response(
+                {"error": "Invalid credit card number"}, status=402
+            )
+
+        confirmation = {
+            "confirmation_number": f"PAYME-{next(confirmation_numbers)}",
+            "amount": body["amount"],
+            "billing_timestamp": int(time()),
+        }
+        if key:
+            charges_by_key[key] = confirmation
+        return web.json_response(confirmation)
+
+    app = web.Application()
+    app.router.add_post("/charges", charge)
+    return app
+
+
+async def start_stub_gateway(
+    host: str = "127.0.0.1", port: int = 8099, latency: float = 0.005
+) -> web.AppRunner:
+    runner = web.AppRunner(create_app(latency))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stub payment gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="seconds per charge"
+    )
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.latency), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
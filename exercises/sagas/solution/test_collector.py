@@ -0,0 +1,53 @@
+import asyncio
+
+from collector import classify_failure
+from temporalio.api.failure.v1 import Failure
+from temporalio.client import WorkflowFailureError
+from temporalio.converter import DataConverter
+from temporalio.exceptions import ActivityError, ApplicationError, RetryState
+
+
+def activity_error(activity_type: str, cause: BaseException) -> ActivityError:
+    error = ActivityError(
+        "Activity task failed",
+        scheduled_event_id=5,
+        started_event_id=6,
+        identity="worker",
+        activity_type=activity_type,
+        activity_id="3",
+        retry_state=RetryState.NON_RETRYABLE_FAILURE,
+    )
+    error.__cause__ = cause
+    return error
+
+
+def workflow_failure(error: BaseException) -> WorkflowFailureError:
+    # What the client sees: the error the workflow raised, after a round trip
+    # through the failure converter, which only follows __cause__
+    async def round_trip():
+        failure = Failure()
+        await DataConverter.default.encode_failure(error, failure)
+        return await DataConverter.default.decode_failure(failure)
+
+    return WorkflowFailureError(cause=asyncio.run(round_trip()))
+
+
+def test_billing_failure_is_classified_by_the_send_bill_error():
+    declined = activity_error(
+        "send_bill",
+        ApplicationError("Invalid charge amount: -1", type="InvalidChargeAmountError"),
+    )
+    try:
+        try:
+            raise declined
+        except ActivityError as e:
+            raise ApplicationError("Unable to bill customer") from e
+    except ApplicationError as e:
+        error = e
+
+    assert classify_failure(workflow_failure(error)) == "InvalidChargeAmountError"
+
+
+def test_untyped_workflow_error_is_classified_by_its_class():
+    error = ApplicationError("Customer lives outside the service area")
+    assert classify_failure(workflow_failure(error)) == "ApplicationError"
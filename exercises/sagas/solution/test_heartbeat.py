@@ -0,0 +1,34 @@
+import asyncio
+from datetime import timedelta
+
+from heartbeat import HeartbeatThrottle
+from temporalio.testing import ActivityEnvironment
+
+
+def heartbeats_of(checkpoints, pause: float = 0.0):
+    env = ActivityEnvironment()
+    sent = []
+    env.on_heartbeat = lambda *details: sent.append(details[0])
+
+    async def run():
+        with HeartbeatThrottle(timedelta(seconds=0.05)) as heartbeats:
+            for checkpoint in checkpoints:
+                heartbeats.send(checkpoint)
+            await asyncio.sleep(pause)
+            before_exit = sent[:]
+        return before_exit, sent
+
+    return env.run(run)
+
+
+def test_the_newest_throttled_checkpoint_is_sent_on_exit():
+    assert asyncio.run(heartbeats_of(range(10))) == ([0], [0, 9])
+
+
+def test_the_newest_throttled_checkpoint_is_sent_after_the_interval():
+    # Sent by the timer, so nothing is left to send on exit
+    assert asyncio.run(heartbeats_of(range(10), pause=0.2)) == ([0, 9], [0, 9])
+
+
+def test_throttle_without_checkpoints_sends_nothing():
+    assert asyncio.run(heartbeats_of([])) == ([], [])
@@ -0,0 +1,61 @@
+import asyncio
+import dataclasses
+
+from activities import PizzaOrderActivities
+from idempotency import IdempotencyStore, idempotency_key
+from shared import Bill, CreditCardCharge, CreditCardInfo
+from temporalio.testing import ActivityEnvironment
+
+
+def environment(run_id: str, attempt: int = 1) -> ActivityEnvironment:
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(
+        env.info,
+        workflow_id="pizza-workflow-order-XD001",
+        workflow_run_id=run_id,
+        activity_id="1",
+        attempt=attempt,
+    )
+    return env
+
+
+def charge(amount: int) -> CreditCardCharge:
+    return CreditCardCharge(
+        bill=Bill(
+            customer_id=8675309,
+            order_number="XD001",
+            description="Pizza order",
+            amount=amount,
+        ),
+        credit_card=CreditCardInfo(holderName="Lisa Anderson", number="4" * 16),
+    )
+
+
+def test_key_differs_between_runs_of_the_same_workflow_id():
+    first = environment("run-1").run(idempotency_key, "process_credit_card")
+    second = environment("run-2").run(idempotency_key, "process_credit_card")
+    assert first != second
+
+
+def test_retry_in_the_same_run_gets_the_stored_result(tmp_path):
+    activities = PizzaOrderActivities(
+        idempotency_store=IdempotencyStore(str(tmp_path / "idempotency.db"))
+    )
+
+    async def run():
+        first = await environment("run-1").run(
+            activities.process_credit_card, charge(4000)
+        )
+        retried = await environment("run-1", attempt=2).run(
+            activities.process_credit_card, charge(9999)
+        )
+        # A new run reusing the workflow ID is a new charge
+        rerun = await environment("run-2").run(
+            activities.process_credit_card, charge(9999)
+        )
+        return first, retried, rerun
+
+    first, retried, rerun = asyncio.run(run())
+    assert retried == first
+    assert rerun.amount == 9999
+    assert activities.idempotency_store.hits == 1
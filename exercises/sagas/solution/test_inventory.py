@@ -0,0 +1,38 @@
+import asyncio
+import dataclasses
+
+from activities import PizzaOrderActivities
+from inventory import DEFAULT_STOCK, InventoryStore, order_ingredients
+from shared import create_pizza_order
+from temporalio.testing import ActivityEnvironment
+
+
+def environment(run_id: str) -> ActivityEnvironment:
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(
+        env.info, workflow_id="pizza-workflow-order-XD001", workflow_run_id=run_id
+    )
+    return env
+
+
+def test_each_run_deducts_an_order_number_again(tmp_path):
+    inventory = InventoryStore(str(tmp_path / "inventory.db"))
+    activities = PizzaOrderActivities(inventory=inventory)
+    order = create_pizza_order()
+
+    async def run():
+        await environment("run-1").run(activities.update_inventory, order)
+        # A retried attempt in the same run is deducted only once
+        await environment("run-1").run(activities.update_inventory, order)
+        first = inventory.stock()
+        await environment("run-1").run(activities.revert_inventory, order)
+        # The next order with the same number, even after a revert
+        await environment("run-2").run(activities.update_inventory, order)
+        return first, inventory.stock()
+
+    first, second = asyncio.run(run())
+    inventory.close()
+    assert first == {
+        name: DEFAULT_STOCK - count for name, count in order_ingredients(order).items()
+    }
+    assert second == first
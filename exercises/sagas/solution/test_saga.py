@@ -0,0 +1,118 @@
+import asyncio
+import logging
+
+import pytest
+import saga
+from saga import Saga
+from temporalio.exceptions import ActivityError, ApplicationError, RetryState
+
+
+async def refund_customer(arg):
+    pass
+
+
+async def revert_inventory(arg):
+    pass
+
+
+async def release_driver(arg):
+    pass
+
+
+def activity_error(message: str) -> ActivityError:
+    error = ActivityError(
+        message,
+        scheduled_event_id=1,
+        started_event_id=2,
+        identity="worker",
+        activity_type="refund_customer",
+        activity_id="1",
+        retry_state=RetryState.MAXIMUM_ATTEMPTS_REACHED,
+    )
+    error.__cause__ = ApplicationError(message)
+    return error
+
+
+class Activities:
+    # Stands in for the workflow's activities: each one records when it
+    # starts and finishes, and the ones in `failing` fail
+    def __init__(self):
+        self.events = []
+        self.failing = set()
+
+    async def execute_activity_method(self, activity, arg, **kwargs):
+        self.events.append(("start", activity.__name__))
+        await asyncio.sleep(0.01)
+        if activity in self.failing:
+            raise activity_error(f"{activity.__name__} failed")
+        self.events.append(("end", activity.__name__))
+
+
+@pytest.fixture
+def activities(monkeypatch):
+    activities = Activities()
+    monkeypatch.setattr(
+        saga.workflow, "execute_activity_method", activities.execute_activity_method
+    )
+    monkeypatch.setattr(saga.workflow, "logger", logging.getLogger("saga-test"))
+    return activities
+
+
+def test_independent_compensations_run_concurrently(activities):
+    rollback = Saga()
+    rollback.add_compensation(refund_customer, None)
+    rollback.add_compensation(revert_inventory, None)
+
+    asyncio.run(rollback.compensate())
+
+    assert [kind for kind, _ in activities.events] == ["start", "start", "end", "end"]
+
+
+def test_compensation_waits_for_the_ones_it_is_ordered_after(activities):
+    rollback = Saga()
+    inventory = rollback.add_compensation(revert_inventory, None)
+    rollback.add_compensation(refund_customer, None, after=[inventory])
+    rollback.add_compensation(release_driver, None, before=[inventory])
+
+    asyncio.run(rollback.compensate())
+
+    assert activities.events == [
+        ("start", "release_driver"),
+        ("end", "release_driver"),
+        ("start", "revert_inventory"),
+        ("end", "revert_inventory"),
+        ("start", "refund_customer"),
+        ("end", "refund_customer"),
+    ]
+
+
+def test_failure_skips_dependents_and_keeps_the_original_error(activities):
+    activities.failing.add(revert_inventory)
+    rollback = Saga()
+    inventory = rollback.add_compensation(revert_inventory, None)
+    rollback.add_compensation(refund_customer, None, after=[inventory])
+    rollback.add_compensation(release_driver, None)
+    original = activity_error("Invalid credit card number")
+
+    with pytest.raises(ApplicationError) as raised:
+        asyncio.run(rollback.compensate(original))
+
+    assert ("start", "refund_customer") not in activities.events
+    assert ("end", "release_driver") in activities.events
+    assert raised.value.type == "CompensationError"
+    assert raised.value.message == "2 compensation(s) did not complete"
+    assert raised.value.details == ("revert_inventory failed",)
+    assert raised.value.__cause__ is original
+
+
+def test_compensations_from_elsewhere_cannot_be_ordered_against(activities):
+    rollback = Saga()
+    other = Saga().add_compensation(revert_inventory, None)
+    with pytest.raises(ValueError):
+        rollback.add_compensation(refund_customer, None, after=[other])
+
+    # Compensations that already ran aren't waiting to run any more
+    earlier = rollback.add_compensation(revert_inventory, None)
+    asyncio.run(rollback.compensate())
+    with pytest.raises(ValueError):
+        rollback.add_compensation(refund_customer, None, before=[earlier])
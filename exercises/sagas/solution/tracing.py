@@ -0,0 +1,32 @@
+import json
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+# Spans are appended to a local file as JSON Lines, one span per line, so a
+# trace can be followed without running a collector. The starter and the
+# workers can share one file, since the file is line buffered and each span
+# is appended with its own write.
+
+
+def span_to_json(span: ReadableSpan) -> str:
+    return json.dumps(json.loads(span.to_json()), separators=(",", ":")) + "\n"
+
+
+def init_tracing(service_name: str, path: str) -> TracerProvider:
+    """
+    Makes spans created in this process go to `path`. Pass a
+    temporalio.contrib.opentelemetry.TracingInterceptor to Client.connect
+    to create spans for starting workflows and, in a worker, for running
+    workflows and activities. Buffered spans are written when the process
+    exits.
+    """
+    provider = TracerProvider(resource=Resource.create({SERVICE_NAME: service_name}))
+    exporter = ConsoleSpanExporter(
+        out=open(path, "a", buffering=1), formatter=span_to_json
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return provider
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import IO, Dict, List, Optional, Tuple
+
+from temporalio.runtime import BUFFERED_METRIC_KIND_GAUGE, MetricBuffer
+from temporalio.worker import ResourceBasedSlotConfig, WorkerTuner
+
+SLOTS_USED = "worker_task_slots_used"
+SLOTS_AVAILABLE = "worker_task_slots_available"
+# Each recording of these histograms is one finished task
+ACTIVITY_LATENCY = "activity_execution_latency"
+WORKFLOW_TASK_LATENCY = "workflow_task_execution_latency"
+
+
+def create_resource_tuner(
+    target_cpu: float, target_memory: float, max_activity_slots: int = 500
+) -> WorkerTuner:
+    # Hands out workflow and activity slots while the host stays under the
+    # CPU and memory targets, instead of a fixed number per worker
+    return WorkerTuner.create_resource_based(
+        target_cpu_usage=target_cpu,
+        target_memory_usage=target_memory,
+        workflow_config=ResourceBasedSlotConfig(minimum_slots=5, maximum_slots=500),
+        activity_config=ResourceBasedSlotConfig(
+            minimum_slots=5, maximum_slots=max_activity_slots
+        ),
+    )
+
+
+def metric_name(name: str) -> str:
+    return name[len("temporal_") :] if name.startswith("temporal_") else name
+
+
+class TuningReport:
+    """
+    Samples the SDK's metrics from a MetricBuffer every `interval` seconds
+    and records, per task queue and worker type, how many slots were in use
+    and available, along with how many activities and workflow tasks
+    finished per second. Each sample is written to `sink` as a JSON line,
+    with the worker's pid so that several workers can share one file.
+    """
+
+    def __init__(
+        self,
+        buffer: MetricBuffer,
+        sink: Optional[IO[str]] = None,
+        interval: float = 1.0,
+    ):
+        self.buffer = buffer
+        self.sink = sink
+        self.interval = interval
+        self.samples: List[dict] = []
+        self._slots: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(dict)
+        self._began = time.monotonic()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+
+    def sample(self) -> dict:
+        finished = defaultdict(int)
+        for update in self.buffer.retrieve_updates():
+            name = metric_name(update.metric.name)
+            if update.metric.kind == BUFFERED_METRIC_KIND_GAUGE and name in (
+                SLOTS_USED,
+                SLOTS_AVAILABLE,
+            ):
+                key = (
+                    update.attributes.get("task_queue", ""),
+                    update.attributes.get("worker_type", ""),
+                )
+                state = "used" if name == SLOTS_USED else "available"
+                self._slots[key][state] = int(update.value)
+            elif name == ACTIVITY_LATENCY:
+                finished["activities"] += 1
+            elif name == WORKFLOW_TASK_LATENCY:
+                finished["workflow_tasks"] += 1
+
+        sample = {
+            "pid": os.getpid(),
+            "elapsed": round(time.monotonic() - self._began, 1),
+            "slots": {
+                f"{queue}/{worker_type}": dict(slots)
+                for (queue, worker_type), slots in sorted(self._slots.items())
+            },
+            "per_second": {
+                kind: round(count / self.interval, 1)
+                for kind, count in finished.items()
+            },
+        }
+        self.samples.append(sample)
+        if self.sink is not None:
+            self.sink.write(json.dumps(sample) + "\n")
+            self.sink.flush()
+        return sample
+
+    def summary(self) -> str:
+        lines = [f"Tuning report over {len(self.samples)} samples"]
+        keys = sorted({key for sample in self.samples for key in sample["slots"]})
+        for key in keys:
+            used = [
+                sample["slots"][key].get("used", 0)
+                for sample in self.samples
+                if key in sample["slots"]
+            ]
+            lines.append(
+                f"{key} slots used: max {max(used)}"
+                f" mean {sum(used) / len(used):.1f} last {used[-1]}"
+            )
+        for kind in ("activities", "workflow_tasks"):
+            rates = [sample["per_second"].get(kind, 0) for sample in self.samples]
+            if any(rates):
+                lines.append(
+                    f"{kind} per second: max {max(rates)}"
+                    f" mean {sum(rates) / len(rates):.1f}"
+                )
+        return "\n".join(lines)
@@ -1,38 +1,327 @@
+import argparse
 import asyncio
 import logging
+import os
 
 from activities import PizzaOrderActivities
-from shared import TASK_QUEUE_NAME
+from activity_metrics import ActivityMetricsInterceptor
+from batch_workflow import PizzaBatchWorkflow
+from batching import MicroBatcher
+from billing import BillingBackend
+from dispatch import DispatchEngine, create_drivers
+from driver_service import DriverService
+from fraud import create_scoring_executor
+from gateway import PaymentGatewayClient
+from geo import DistanceEngine
+from idempotency import IdempotencyStore
+from inventory import InventoryStore
+from shared import DRIVER_TASK_QUEUE_NAME, TASK_QUEUE_NAME
 from temporalio import workflow
 from temporalio.client import Client
+from temporalio.contrib.opentelemetry import TracingInterceptor
+from temporalio.runtime import (
+    MetricBuffer,
+    PrometheusConfig,
+    Runtime,
+    TelemetryConfig,
+)
 from temporalio.worker import Worker
+from tracing import init_tracing
+from tuning import TuningReport, create_resource_tuner
 from workflow import PizzaOrderWorkflow
 
 
-async def main():
-
-    logging.basicConfig(level=logging.INFO)
-    workflow.logger.workflow_info_on_message = False
-    client = await Client.connect("localhost:7233", namespace="default")
-
-    activities = PizzaOrderActivities()
-
-    worker = Worker(
+def create_worker(
+    client: Client, activities: PizzaOrderActivities, **worker_options
+) -> Worker:
+    return Worker(
         client,
         task_queue=TASK_QUEUE_NAME,
-        workflows=[PizzaOrderWorkflow],
+        workflows=[PizzaOrderWorkflow, PizzaBatchWorkflow],
         activities=[
             activities.get_distance,
+            activities.get_distances,
             activities.send_bill,
             activities.process_credit_card,
-            activities.notify_delivery_driver,
+            activities.score_fraud,
+            activities.request_delivery_driver,
+            activities.assign_delivery_driver,
             activities.update_inventory,
             activities.revert_inventory,
+            activities.reserve_inventory,
+            activities.commit_inventory,
             activities.refund_customer,
+            activities.read_orders,
         ],
+        **worker_options,
+    )
+
+
+def create_driver_worker(
+    client: Client, activities: PizzaOrderActivities, **worker_options
+) -> Worker:
+    return Worker(
+        client,
+        task_queue=DRIVER_TASK_QUEUE_NAME,
+        activities=[activities.notify_delivery_driver],
+        **worker_options,
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run the pizza order worker")
+    parser.add_argument(
+        "--centroids",
+        help="postal code centroid table (.npy) used by get_distances",
+    )
+    parser.add_argument(
+        "--bill-batch-size",
+        type=int,
+        default=0,
+        help="submit up to N bills to the billing backend in one call",
+    )
+    parser.add_argument(
+        "--bill-batch-window-ms",
+        type=float,
+        default=10,
+        help="how long a bill waits for others to join its batch",
+    )
+    parser.add_argument(
+        "--payment-gateway",
+        metavar="URL",
+        help="charge cards through the payment gateway at this URL",
+    )
+    parser.add_argument(
+        "--gateway-connections",
+        type=int,
+        default=100,
+        help="maximum pooled connections to the payment gateway",
+    )
+    parser.add_argument(
+        "--idempotency-db",
+        help="SQLite file recording completed charges and refunds by key",
+    )
+    parser.add_argument(
+        "--drivers",
+        type=int,
+        default=0,
+        help="number of simulated drivers available to the dispatch engine",
+    )
+    parser.add_argument(
+        "--inventory-db",
+        help="SQLite database tracking ingredient stock, shared by all workers",
     )
+    parser.add_argument(
+        "--inventory-batch-size",
+        type=int,
+        default=100,
+        help="most inventory updates to deduct in one transaction",
+    )
+    parser.add_argument(
+        "--inventory-hold-seconds",
+        type=float,
+        default=300,
+        help="how long reserved ingredients are held before they expire",
+    )
+    parser.add_argument(
+        "--scoring-executor",
+        choices=["process", "thread", "inline"],
+        default="inline",
+        help="where score_fraud runs its CPU-bound scoring; use process with "
+        "--fraud-check orders",
+    )
+    parser.add_argument(
+        "--scoring-workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="processes or threads in the scoring executor",
+    )
+    parser.add_argument(
+        "--queues",
+        choices=["all", "orders", "drivers"],
+        default="all",
+        help="poll both task queues, or only the order or driver queue",
+    )
+    parser.add_argument(
+        "--max-concurrent-activities",
+        type=int,
+        default=100,
+        help="activity slots for the order task queue, or the most the resource tuner uses",
+    )
+    parser.add_argument(
+        "--driver-concurrency",
+        type=int,
+        default=500,
+        help="activity slots for notify_delivery_driver on the driver task queue",
+    )
+    parser.add_argument(
+        "--tuner",
+        choices=["fixed", "resource"],
+        default="fixed",
+        help="size the order queue's slots by fixed limits or by CPU and memory use",
+    )
+    parser.add_argument(
+        "--target-cpu",
+        type=float,
+        default=0.8,
+        help="CPU usage the resource-based tuner stays under",
+    )
+    parser.add_argument(
+        "--target-memory",
+        type=float,
+        default=0.8,
+        help="memory usage the resource-based tuner stays under",
+    )
+    parser.add_argument(
+        "--tuning-report",
+        metavar="PATH",
+        help="write slot usage and throughput samples to this file as JSON Lines",
+    )
+    parser.add_argument(
+        "--metrics-address",
+        metavar="HOST:PORT",
+        help="serve SDK and activity metrics for Prometheus at this address",
+    )
+    parser.add_argument(
+        "--trace-file",
+        help="append OpenTelemetry spans for workflows and activities to this file",
+    )
+    args = parser.parse_args()
+    if args.metrics_address and args.tuning_report:
+        # The runtime exports its metrics to exactly one place
+        parser.error("--metrics-address and --tuning-report can't be combined")
+
+    logging.basicConfig(level=logging.INFO)
+    workflow.logger.workflow_info_on_message = False
+    runtime = None
+    metric_buffer = None
+    if args.tuning_report:
+        metric_buffer = MetricBuffer(buffer_size=100_000)
+        runtime = Runtime(telemetry=TelemetryConfig(metrics=metric_buffer))
+    elif args.metrics_address:
+        runtime = Runtime(
+            telemetry=TelemetryConfig(
+                metrics=PrometheusConfig(bind_address=args.metrics_address)
+            )
+        )
+    # The tracing interceptor on the client is used by its workers too
+    client_interceptors = []
+    if args.trace_file:
+        init_tracing("pizza-worker", args.trace_file)
+        client_interceptors.append(TracingInterceptor())
+    client = await Client.connect(
+        "localhost:7233",
+        namespace="default",
+        runtime=runtime,
+        interceptors=client_interceptors,
+    )
+
+    distance_engine = DistanceEngine(args.centroids) if args.centroids else None
+    bill_batcher = None
+    if args.bill_batch_size > 0:
+        bill_batcher = MicroBatcher(
+            BillingBackend().submit_bills,
+            max_batch_size=args.bill_batch_size,
+            max_wait=args.bill_batch_window_ms / 1000,
+        )
+    payment_gateway = None
+    if args.payment_gateway:
+        payment_gateway = PaymentGatewayClient(
+            args.payment_gateway, max_connections=args.gateway_connections
+        )
+    idempotency_store = None
+    if args.idempotency_db:
+        idempotency_store = IdempotencyStore(args.idempotency_db)
+    inventory = None
+    if args.inventory_db:
+        inventory = InventoryStore(
+            args.inventory_db,
+            max_batch_size=args.inventory_batch_size,
+            hold=args.inventory_hold_seconds,
+        )
+    scoring_executor = create_scoring_executor(
+        args.scoring_executor, args.scoring_workers
+    )
+    dispatch = None
+    if args.drivers > 0:
+        dispatch = DispatchEngine(create_drivers(args.drivers), minutes_per_km=2)
+    activities = PizzaOrderActivities(
+        distance_engine=distance_engine,
+        bill_batcher=bill_batcher,
+        payment_gateway=payment_gateway,
+        idempotency_store=idempotency_store,
+        driver_service=DriverService(client),
+        dispatch=dispatch,
+        inventory=inventory,
+        scoring_executor=scoring_executor,
+    )
+
+    interceptors = [ActivityMetricsInterceptor()]
+    workers = []
+    if args.queues in ("all", "orders"):
+        if args.tuner == "resource":
+            # The SDK doesn't allow a tuner together with fixed limits
+            slots = dict(
+                tuner=create_resource_tuner(
+                    args.target_cpu,
+                    args.target_memory,
+                    max_activity_slots=args.max_concurrent_activities,
+                )
+            )
+        else:
+            slots = dict(max_concurrent_activities=args.max_concurrent_activities)
+        workers.append(
+            create_worker(client, activities, interceptors=interceptors, **slots)
+        )
+    if args.queues in ("all", "drivers"):
+        workers.append(
+            create_driver_worker(
+                client,
+                activities,
+                interceptors=interceptors,
+                max_concurrent_activities=args.driver_concurrency,
+            )
+        )
     logging.info(f"Starting the worker....{client.identity}")
-    await worker.run()
+    sweeper = None
+    if inventory is not None:
+        # Returns expired inventory holds to the stock
+        sweeper = asyncio.create_task(inventory.sweep())
+    report = None
+    report_sink = None
+    if metric_buffer is not None:
+        report_sink = open(args.tuning_report, "a")
+        report = TuningReport(metric_buffer, report_sink)
+        report_task = asyncio.create_task(report.run())
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        if sweeper is not None:
+            sweeper.cancel()
+        if report is not None:
+            report_task.cancel()
+            report.sample()
+            report_sink.close()
+            logging.info(report.summary())
+        logging.info(f"Distance cache {activities.get_distance.cache.stats()}")
+        if bill_batcher is not None:
+            logging.info(f"Bill batching {bill_batcher.stats()}")
+        if payment_gateway is not None:
+            logging.info(f"Payment gateway {payment_gateway.stats()}")
+            await payment_gateway.close()
+        if idempotency_store is not None:
+            logging.info(f"Idempotency store hits: {idempotency_store.hits}")
+            idempotency_store.close()
+        if inventory is not None:
+            logging.info(f"Inventory {inventory.stats()}")
+            inventory.close()
+        if scoring_executor is not None:
+            scoring_executor.shutdown()
+        if dispatch is not None:
+            logging.info(
+                f"Dispatch assigned {dispatch.assignments} drivers, "
+                f"{dispatch.unmatched} orders found no free driver"
+            )
 
 
 if __name__ == "__main__":
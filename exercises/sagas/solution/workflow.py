@@ -1,6 +1,9 @@
 import asyncio
+from contextlib import suppress
 from datetime import timedelta
+from typing import Optional
 
+from saga import Saga
 from temporalio import workflow
 from temporalio.common import RetryPolicy
 from temporalio.exceptions import ActivityError, ApplicationError
@@ -8,16 +11,36 @@ from temporalio.exceptions import ActivityError, ApplicationError
 # Import activity, passing it through the sandbox without reloading the module
 with workflow.unsafe.imports_passed_through():
     from activities import PizzaOrderActivities
-    from shared import Bill, CreditCardCharge, OrderConfirmation, PizzaOrder
+    from shared import (
+        DRIVER_TASK_QUEUE_NAME,
+        Bill,
+        CreditCardCharge,
+        DispatchRequest,
+        FraudCheck,
+        OrderConfirmation,
+        OrderOptions,
+        PizzaOrder,
+    )
+
+
+def is_declined(error: ActivityError) -> bool:
+    return (
+        isinstance(error.cause, ApplicationError)
+        and error.cause.type == "CreditCardProcessingError"
+    )
 
 
 @workflow.defn
 class PizzaOrderWorkflow:
 
     @workflow.run
-    async def order_pizza(self, order: PizzaOrder) -> OrderConfirmation:
+    async def order_pizza(
+        self, order: PizzaOrder, options: Optional[OrderOptions] = None
+    ) -> OrderConfirmation:
 
-        compensations = []
+        options = options or OrderOptions()
+        self.options = options
+        saga = Saga()
 
         retry_policy = RetryPolicy(
             initial_interval=timedelta(seconds=15),
@@ -35,31 +58,45 @@ class PizzaOrderWorkflow:
         for pizza in order.items:
             total_price += pizza.price
 
-        distance = await workflow.execute_activity_method(
-            PizzaOrderActivities.get_distance,
-            address,
-            start_to_close_timeout=timedelta(seconds=5),
-        )
+        if options.parallel_steps:
+            # Neither the preparation timer nor update_inventory needs the
+            # distance, so start them alongside get_distance. The inventory
+            # compensation is still registered before the update starts.
+            preparation = asyncio.create_task(asyncio.sleep(3))
+            inventory_update = self._update_inventory(saga, order)
 
-        if order.is_delivery and distance.kilometers > 25:
-            error_message = "Customer lives outside the service area"
-            workflow.logger.error(error_message)
-            raise ApplicationError(error_message)
+        try:
+            distance = await self._start_activity(
+                PizzaOrderActivities.get_distance,
+                address,
+                start_to_close_timeout=timedelta(seconds=5),
+            )
+
+            if order.is_delivery and distance.kilometers > 25:
+                error_message = "Customer lives outside the service area"
+                workflow.logger.error(error_message)
+                raise ApplicationError(error_message)
+        except (ActivityError, ApplicationError) as e:
+            if options.parallel_steps:
+                # Let the inventory update settle before reverting it
+                with suppress(ActivityError):
+                    await inventory_update
+                await saga.compensate(e)
+            raise
 
         workflow.logger.info(f"Distance is {distance.kilometers}")
 
-        # Use a short timer duration here to simulate the passage of time
-        # while avoiding delaying the exercise
+        if not options.parallel_steps:
+            # Use a short timer duration here to simulate the passage of time
+            # while avoiding delaying the exercise
 
-        await asyncio.sleep(3)
+            await asyncio.sleep(3)
 
         try:
-            compensations.append({"activity": "revert_inventory", "input": order})
-            await workflow.execute_activity_method(
-                PizzaOrderActivities.update_inventory,
-                order,
-                start_to_close_timeout=timedelta(seconds=5),
-            )
+            if options.parallel_steps:
+                await inventory_update
+            else:
+                await self._update_inventory(saga, order)
 
             bill = Bill(
                 customer_id=order.customer.customer_id,
@@ -71,44 +108,93 @@ class PizzaOrderWorkflow:
             credit_card_charge = CreditCardCharge(
                 bill=bill, credit_card=order.credit_card_info
             )
-            compensations.append(
-                {"activity": "refund_customer", "input": credit_card_charge}
-            )
-            credit_card_confirmation = await workflow.execute_activity_method(
-                PizzaOrderActivities.process_credit_card,
-                credit_card_charge,
-                start_to_close_timeout=timedelta(seconds=5),
-                retry_policy=retry_policy,
-                heartbeat_timeout=timedelta(seconds=10),
-            )
-        except ActivityError as e:
-            workflow.logger.error(e.message)
-            # Note: If your compensating actions have the possibility
-            # of failure, you'll also want to have try/except blocks here
-            for compensation in reversed(compensations):
+
+            if options.fraud_check:
                 await workflow.execute_activity_method(
-                    compensation["activity"],
-                    compensation["input"],
+                    PizzaOrderActivities.score_fraud,
+                    FraudCheck(
+                        order_number=order.order_number,
+                        amount=total_price,
+                        card_number=order.credit_card_info.number,
+                        postal_code=address.postal_code,
+                        items=len(order.items),
+                    ),
+                    start_to_close_timeout=timedelta(seconds=5),
+                )
+
+            if not options.reserve_inventory:
+                saga.add_compensation(
+                    PizzaOrderActivities.refund_customer, credit_card_charge
+                )
+            try:
+                credit_card_confirmation = await workflow.execute_activity_method(
+                    PizzaOrderActivities.process_credit_card,
+                    credit_card_charge,
                     start_to_close_timeout=timedelta(seconds=5),
+                    retry_policy=retry_policy,
+                    heartbeat_timeout=timedelta(seconds=10),
+                )
+            except ActivityError as e:
+                # In reservation mode a declined card, which was never
+                # charged, has nothing to roll back, but a charge that timed
+                # out or failed otherwise may still have gone through
+                if options.reserve_inventory and not is_declined(e):
+                    saga.add_compensation(
+                        PizzaOrderActivities.refund_customer, credit_card_charge
+                    )
+                raise
+            if options.reserve_inventory:
+                saga.add_compensation(
+                    PizzaOrderActivities.refund_customer, credit_card_charge
                 )
+
+            if options.reserve_inventory:
+                await self._start_activity(
+                    PizzaOrderActivities.commit_inventory,
+                    order,
+                    start_to_close_timeout=timedelta(seconds=5),
+                )
+        except ActivityError as e:
+            workflow.logger.error(e.message)
+            await saga.compensate(e)
             raise e
 
         try:
-            confirmation = await workflow.execute_activity_method(
+            confirmation = await self._start_activity(
                 PizzaOrderActivities.send_bill,
                 bill,
                 start_to_close_timeout=timedelta(seconds=5),
             )
         except ActivityError as e:
             workflow.logger.error(f"Unable to bill customer {e.message}")
-            raise ApplicationError("Unable to bill customer")
+            raise ApplicationError("Unable to bill customer") from e
 
-        delivery_driver_available = await workflow.execute_activity_method(
-            PizzaOrderActivities.notify_delivery_driver,
-            confirmation,
-            start_to_close_timeout=timedelta(minutes=5),
-            heartbeat_timeout=timedelta(seconds=10),
-        )
+        if options.parallel_steps:
+            # The driver can only be notified once the order has been prepared
+            await preparation
+
+        if options.dispatch_drivers:
+            assignment = await workflow.execute_activity_method(
+                PizzaOrderActivities.assign_delivery_driver,
+                DispatchRequest(order_number=order.order_number, address=address),
+                start_to_close_timeout=timedelta(seconds=5),
+            )
+            workflow.logger.info(f"Driver assignment: {assignment}")
+            delivery_driver_available = assignment.driver_id is not None
+        elif options.async_driver_notification:
+            delivery_driver_available = await workflow.execute_activity_method(
+                PizzaOrderActivities.request_delivery_driver,
+                confirmation,
+                start_to_close_timeout=timedelta(minutes=5),
+            )
+        else:
+            delivery_driver_available = await workflow.execute_activity_method(
+                PizzaOrderActivities.notify_delivery_driver,
+                confirmation,
+                task_queue=DRIVER_TASK_QUEUE_NAME,
+                start_to_close_timeout=timedelta(minutes=5),
+                heartbeat_timeout=timedelta(seconds=10),
+            )
 
         if not delivery_driver_available:
             # Notify customer delivery is not available and they will have to come
@@ -118,3 +204,22 @@ class PizzaOrderWorkflow:
             confirmation.status = "DELIVERY FAILURE"
 
         return confirmation
+
+    def _update_inventory(self, saga: Saga, order: PizzaOrder):
+        # A reservation is put back by the inventory store when it expires
+        # uncommitted, so only a final deduction needs a compensation
+        if self.options.reserve_inventory:
+            activity = PizzaOrderActivities.reserve_inventory
+        else:
+            saga.add_compensation(PizzaOrderActivities.revert_inventory, order)
+            activity = PizzaOrderActivities.update_inventory
+        return self._start_activity(
+            activity, order, start_to_close_timeout=timedelta(seconds=5)
+        )
+
+    def _start_activity(self, activity, arg, **kwargs):
+        # Cheap steps can skip the round trip through the task queue by
+        # running as local activities inside the workflow task
+        if activity.__name__ in self.options.local_activities:
+            return workflow.start_local_activity_method(activity, arg, **kwargs)
+        return workflow.start_activity_method(activity, arg, **kwargs)